@@ -0,0 +1,532 @@
+# ####################################################################
+# # 		* Simon, Sanmar (1938126)
+# # 		* Harti, Ghali (1953494)
+# ####################################################################
+
+from CustomBoard import (ZOBRIST_NB_WALLS, ZOBRIST_PAWNS,
+                         ZOBRIST_WALL_ACTIONS, ZOBRIST_WALLS)
+from quoridor import (ACTION_KINDS, ACTION_POSITIONS, KIND_WH,
+                      NB_PAWN_ACTIONS, PLAYER1, PLAYER2, InvalidAction,
+                      NoPath, encode_action, mask_bits)
+
+SIZE = 9
+NB_CELLS = SIZE * SIZE
+
+# Cell (x, y) is bit x * 9 + y of an 81-bit mask and wall slot (x, y) is
+# bit x * 8 + y of a 64-bit mask
+ALL_CELLS = (1 << NB_CELLS) - 1
+ROW_MASKS = [((1 << SIZE) - 1) << (x * SIZE) for x in range(SIZE)]
+FIRST_COL = sum(1 << (x * SIZE) for x in range(SIZE))
+LAST_COL = FIRST_COL << (SIZE - 1)
+
+# Cells from which a step in a direction stays on the board
+CAN_GO_DOWN = ALL_CELLS & ~ROW_MASKS[SIZE - 1]
+CAN_GO_UP = ALL_CELLS & ~ROW_MASKS[0]
+CAN_GO_RIGHT = ALL_CELLS & ~LAST_COL
+CAN_GO_LEFT = ALL_CELLS & ~FIRST_COL
+
+CELL_POS = [divmod(c, SIZE) for c in range(NB_CELLS)]
+
+
+def cell_bit(x, y):
+    return 1 << (x * SIZE + y)
+
+
+def slot_bit(x, y):
+    return 1 << (x * (SIZE - 1) + y)
+
+
+def _build_wall_tables():
+    """
+    For every wall slot, compute the cells whose steps are cut by a wall
+    placed there and the slots it would overlap or cross
+    """
+    h_cuts_down, h_cuts_up, v_cuts_right, v_cuts_left = [], [], [], []
+    h_conflicts, v_conflicts = [], []
+    for x in range(SIZE - 1):
+        for y in range(SIZE - 1):
+            h_cuts_down.append(cell_bit(x, y) | cell_bit(x, y + 1))
+            h_cuts_up.append(cell_bit(x + 1, y) | cell_bit(x + 1, y + 1))
+            v_cuts_right.append(cell_bit(x, y) | cell_bit(x + 1, y))
+            v_cuts_left.append(cell_bit(x, y + 1) | cell_bit(x + 1, y + 1))
+            h_conflict = slot_bit(x, y)
+            v_conflict = slot_bit(x, y)
+            if y > 0:
+                h_conflict |= slot_bit(x, y - 1)
+            if y < SIZE - 2:
+                h_conflict |= slot_bit(x, y + 1)
+            if x > 0:
+                v_conflict |= slot_bit(x - 1, y)
+            if x < SIZE - 2:
+                v_conflict |= slot_bit(x + 1, y)
+            h_conflicts.append(h_conflict)
+            v_conflicts.append(v_conflict)
+    return h_cuts_down, h_cuts_up, v_cuts_right, v_cuts_left, \
+        h_conflicts, v_conflicts
+
+
+H_CUTS_DOWN, H_CUTS_UP, V_CUTS_RIGHT, V_CUTS_LEFT, \
+    H_CONFLICTS, V_CONFLICTS = _build_wall_tables()
+
+
+class BitBoard:
+    """
+    Quoridor Board encoded with integer bitmasks.
+    Pawns are 81-bit cell masks, walls are 64-bit slot masks and the open
+    edges are kept as four 81-bit masks (one per direction) updated on each
+    wall placement. It exposes the same API as CustomBoard.
+    """
+
+    __slots__ = ('pawn_bits', 'goals', 'nb_walls', 'horiz', 'verti',
+                 'open_down', 'open_up', 'open_right', 'open_left')
+
+    # The same for every board
+    size = SIZE
+    starting_walls = 10
+
+    def __init__(self, percepts=None):
+        """
+        Constructor of the representation for a quoridor game of size 9.
+        The representation can be initialized by a percepts
+        If percepts==None:
+            player 0 is position (4,0) and its goal is to reach the row 8
+            player 1 is position (4,8) and its goal is to reach the row 0
+            each player owns 10 walls and there is initially no wall on the
+            board
+        """
+        self.pawn_bits = [cell_bit(0, 4), cell_bit(8, 4)]
+        self.goals = [8, 0]
+        self.nb_walls = [self.starting_walls, self.starting_walls]
+        self.horiz = 0
+        self.verti = 0
+        # Cells whose edge in each direction is neither a border nor a wall
+        self.open_down = CAN_GO_DOWN
+        self.open_up = CAN_GO_UP
+        self.open_right = CAN_GO_RIGHT
+        self.open_left = CAN_GO_LEFT
+
+        if percepts is not None:
+            for player in (PLAYER1, PLAYER2):
+                (x, y) = percepts['pawns'][player]
+                self.pawn_bits[player] = cell_bit(x, y)
+                self.goals[player] = percepts['goals'][player]
+                self.nb_walls[player] = percepts['nb_walls'][player]
+            for (x, y) in percepts['horiz_walls']:
+                self.set_wall((x, y), True)
+            for (x, y) in percepts['verti_walls']:
+                self.set_wall((x, y), False)
+
+    @property
+    def pawns(self):
+        """Positions of the pawns as (row, col) tuples"""
+        return (CELL_POS[self.pawn_bits[0].bit_length() - 1],
+                CELL_POS[self.pawn_bits[1].bit_length() - 1])
+
+    @property
+    def horiz_walls(self):
+        return [divmod(s, SIZE - 1) for s in mask_bits(self.horiz)]
+
+    @property
+    def verti_walls(self):
+        return [divmod(s, SIZE - 1) for s in mask_bits(self.verti)]
+
+    @property
+    def zobrist(self):
+        """Zobrist hash of the position, with the keys of CustomBoard but
+        without the side to move"""
+        zobrist = 0
+        for player in (PLAYER1, PLAYER2):
+            zobrist ^= ZOBRIST_PAWNS[player][
+                self.pawn_bits[player].bit_length() - 1]
+            zobrist ^= ZOBRIST_NB_WALLS[player][self.nb_walls[player]]
+        for s in mask_bits(self.horiz):
+            zobrist ^= ZOBRIST_WALLS[True][s]
+        for s in mask_bits(self.verti):
+            zobrist ^= ZOBRIST_WALLS[False][s]
+        return zobrist
+
+    def pretty_print(self):
+        """print of the representation"""
+        print("Player 0 => pawn:", self.pawns[0], "goal:",
+              self.goals[0], "nb walls:", self.nb_walls[0])
+        print("Player 1 => pawn:", self.pawns[1], "goal:",
+              self.goals[1], "nb walls:", self.nb_walls[1])
+        print("Horizontal walls:", self.horiz_walls)
+        print("Vertical walls:", self.verti_walls)
+
+    def __str__(self):
+        """String representation of the board"""
+        pawns = self.pawns
+        horiz_walls = set(self.horiz_walls)
+        verti_walls = set(self.verti_walls)
+        board_str = ""
+        for i in range(self.size):
+            for j in range(self.size):
+                if pawns[0][0] == i and pawns[0][1] == j:
+                    board_str += "P1"
+                elif pawns[1][0] == i and pawns[1][1] == j:
+                    board_str += "P2"
+                else:
+                    board_str += "OO"
+                if (i, j) in verti_walls:
+                    board_str += "|"
+                elif (i - 1, j) in verti_walls:
+                    board_str += "|"
+                else:
+                    board_str += " "
+            board_str += "\n"
+            for j in range(self.size):
+                if (i, j) in horiz_walls:
+                    board_str += "---"
+                elif (i, j - 1) in horiz_walls:
+                    board_str += "-- "
+                elif (i, j) in verti_walls:
+                    board_str += "  |"
+                else:
+                    board_str += "   "
+            board_str += "\n"
+        return board_str
+
+    def clone(self):
+        """Return a clone of this object."""
+        clone_board = BitBoard.__new__(BitBoard)
+        clone_board.pawn_bits = self.pawn_bits[:]
+        clone_board.goals = self.goals
+        clone_board.nb_walls = self.nb_walls[:]
+        clone_board.horiz = self.horiz
+        clone_board.verti = self.verti
+        clone_board.open_down = self.open_down
+        clone_board.open_up = self.open_up
+        clone_board.open_right = self.open_right
+        clone_board.open_left = self.open_left
+        return clone_board
+
+    def set_wall(self, pos, is_horiz):
+        """Put the wall bit and close the four edges it cuts"""
+        (x, y) = pos
+        s = x * (SIZE - 1) + y
+        if is_horiz:
+            self.horiz |= 1 << s
+            self.open_down &= ~H_CUTS_DOWN[s]
+            self.open_up &= ~H_CUTS_UP[s]
+        else:
+            self.verti |= 1 << s
+            self.open_right &= ~V_CUTS_RIGHT[s]
+            self.open_left &= ~V_CUTS_LEFT[s]
+
+    def step(self, cells):
+        """Returns the cells reachable in one simple move from cells"""
+        return ((cells & self.open_down) << SIZE) | \
+            ((cells & self.open_up) >> SIZE) | \
+            ((cells & self.open_right) << 1) | \
+            ((cells & self.open_left) >> 1)
+
+    def jumps(self, cell, opponent):
+        """
+        Returns the cells reachable from cell by jumping over the opponent
+        pawn (straight or diagonally when the straight jump is blocked).
+        cell must be next to the opponent with no wall in between.
+        """
+        delta = opponent.bit_length() - cell.bit_length()
+        if delta == SIZE:
+            straight = (opponent & self.open_down) << SIZE
+            sides = ((opponent & self.open_right) << 1) | \
+                ((opponent & self.open_left) >> 1)
+        elif delta == -SIZE:
+            straight = (opponent & self.open_up) >> SIZE
+            sides = ((opponent & self.open_right) << 1) | \
+                ((opponent & self.open_left) >> 1)
+        elif delta == 1:
+            straight = (opponent & self.open_right) << 1
+            sides = ((opponent & self.open_down) << SIZE) | \
+                ((opponent & self.open_up) >> SIZE)
+        else:
+            straight = (opponent & self.open_left) >> 1
+            sides = ((opponent & self.open_down) << SIZE) | \
+                ((opponent & self.open_up) >> SIZE)
+        return straight if straight else sides
+
+    def pawn_targets(self, cell, opponent):
+        """Returns the mask of cells a pawn on cell can move to"""
+        targets = self.step(cell)
+        if targets & opponent:
+            targets = (targets ^ opponent) | self.jumps(cell, opponent)
+        return targets
+
+    def can_move_here(self, i, j, player):
+        """Returns true if the player can move to (i, j),
+        false otherwise
+        """
+        return self.is_pawn_move_ok(self.pawns[player], (i, j),
+                                    self.pawns[(player + 1) % 2])
+
+    def is_pawn_move_ok(self, former_pos, new_pos, opponent_pos):
+        """Returns True if moving one pawn from former_pos to new_pos is
+        valid i.e. it respects the rules of quoridor
+        """
+        (row_new, col_new) = new_pos
+        if row_new >= self.size or row_new < 0 or \
+                col_new >= self.size or col_new < 0:
+            return False
+        (row_op, col_op) = opponent_pos
+        if 0 <= row_op < self.size and 0 <= col_op < self.size:
+            opponent = cell_bit(row_op, col_op)
+        else:
+            opponent = 0
+        return bool(self.pawn_targets(cell_bit(*former_pos), opponent) &
+                    cell_bit(row_new, col_new))
+
+    def paths_exist(self):
+        """Returns True if there exists a path from both players to
+        at least one of their respective goals; False otherwise.
+        """
+        try:
+            self.min_steps_before_victory(0)
+            self.min_steps_before_victory(1)
+            return True
+        except NoPath:
+            return False
+
+    def get_shortest_path(self, player):
+        """ Returns a shortest path for player to reach its goal
+        if player is on its goal, the shortest path is an empty list
+        if no path exists, exception is thrown.
+        The search floods whole BFS layers at once with bitwise shifts.
+        """
+        return self.shortest_path_avoiding(player,
+                                           self.pawn_bits[1 - player])
+
+    def shortest_path_avoiding(self, player, opponent):
+        """
+        Same as get_shortest_path but the pawn to jump over is given as a
+        cell mask (0 to ignore the opponent)
+        """
+        source = self.pawn_bits[player]
+        goal = ROW_MASKS[self.goals[player]]
+        if source & goal:
+            return []
+        near_opponent = self.step(opponent)
+        visited = source | opponent
+        frontier = source
+        layers = [source]
+        while frontier:
+            reached = self.step(frontier)
+            for c in mask_bits(frontier & near_opponent):
+                reached |= self.jumps(1 << c, opponent)
+            reached &= ~visited
+            if not reached:
+                break
+            layers.append(reached)
+            if reached & goal:
+                return self._trace_back(layers, reached & goal,
+                                        near_opponent, opponent)
+            visited |= reached
+            frontier = reached
+        raise NoPath()
+
+    def _trace_back(self, layers, arrival, near_opponent, opponent):
+        """Rebuild a path from the BFS layers, ending on a cell of arrival"""
+        current = arrival & -arrival
+        path = []
+        for k in range(len(layers) - 1, 0, -1):
+            path.append(CELL_POS[current.bit_length() - 1])
+            predecessors = self.step(current) & layers[k - 1]
+            if not predecessors:
+                for c in mask_bits(layers[k - 1] & near_opponent):
+                    if self.jumps(1 << c, opponent) & current:
+                        predecessors = 1 << c
+                        break
+            current = predecessors & -predecessors
+        path.reverse()
+        return path
+
+    def min_steps_before_victory(self, player):
+        """Returns the minimum number of pawn moves necessary for the
+        player to reach its goal raw.
+        """
+        return len(self.get_shortest_path(player))
+
+    def min_steps_before_victory_safe(self, player):
+        """
+        Simply handle the case where there are no shortest path
+        """
+        try:
+            return len(self.get_shortest_path(player))
+        except NoPath:
+            return len(self.shortest_path_avoiding(player, 0))
+
+    def add_wall(self, pos, is_horiz, player):
+        """Player adds a wall in position pos. The wall is horizontal
+        if is_horiz and is vertical otherwise.
+        if it is not possible to add such a wall because the rules of
+        quoridor game don't accept it nothing is done.
+        """
+        if self.nb_walls[player] <= 0 or \
+                not self.is_wall_possible_here(pos, is_horiz):
+            return
+        self.add_wall_with_no_check(pos, is_horiz, player)
+
+    def add_wall_with_no_check(self, pos, is_horiz, player):
+        self.set_wall(pos, is_horiz)
+        self.nb_walls[player] -= 1
+
+    def move_pawn(self, new_pos, player):
+        """Modifies the state of the board to take into account the
+        new position of the pawn of player.
+        """
+        self.pawn_bits[player] = cell_bit(*new_pos)
+
+    def is_wall_possible_here(self, pos, is_horiz):
+        """
+        Returns True if it is possible to put a wall in position pos
+        with direction specified by is_horiz.
+        """
+        if not self.is_wall_slot_free(pos, is_horiz):
+            return False
+        saved = (self.horiz, self.verti, self.open_down, self.open_up,
+                 self.open_right, self.open_left)
+        self.set_wall(pos, is_horiz)
+        possible = self.paths_exist()
+        (self.horiz, self.verti, self.open_down, self.open_up,
+         self.open_right, self.open_left) = saved
+        return possible
+
+    def is_wall_slot_free(self, pos, is_horiz):
+        """Returns True if a wall in position pos would be on the board
+        without overlapping or crossing another wall.
+        """
+        (x, y) = pos
+        if x >= self.size - 1 or x < 0 or y >= self.size - 1 or y < 0:
+            return False
+        s = x * (SIZE - 1) + y
+        if is_horiz:
+            return not (self.horiz & H_CONFLICTS[s] or self.verti >> s & 1)
+        return not (self.verti & V_CONFLICTS[s] or self.horiz >> s & 1)
+
+    def get_legal_pawn_moves(self, player):
+        """Returns legal moves for the pawn of player."""
+        targets = self.pawn_targets(self.pawn_bits[player],
+                                    self.pawn_bits[1 - player])
+        return [('P',) + CELL_POS[c] for c in mask_bits(targets)]
+
+    def get_legal_wall_moves(self, player):
+        """Returns legal wall placements (adding a wall
+        somewhere) for player.
+        """
+        moves = []
+        if self.nb_walls[player] <= 0:
+            return moves
+        for i in range(self.size - 1):
+            for j in range(self.size - 1):
+                if self.is_wall_possible_here((i, j), True):
+                    moves.append(('WH', i, j))
+                if self.is_wall_possible_here((i, j), False):
+                    moves.append(('WV', i, j))
+        return moves
+
+    def get_actions(self, player):
+        """ Returns all the possible actions for player."""
+        pawn_moves = self.get_legal_pawn_moves(player)
+        wall_moves = self.get_legal_wall_moves(player)
+        pawn_moves.extend(wall_moves)
+        return pawn_moves
+
+    def is_action_valid(self, action, player):
+        """Returns True if the action played by player
+        is valid; False otherwise.
+        """
+        kind, i, j = action
+        if kind == 'P':
+            return self.is_pawn_move_ok(self.pawns[player], (i, j),
+                                        self.pawns[(player + 1) % 2])
+        elif kind == 'WH':
+            return self.is_wall_possible_here((i, j), True)
+        elif kind == 'WV':
+            return self.is_wall_possible_here((i, j), False)
+        else:
+            return False
+
+    def play_action(self, action, player):
+        """Play an action if it is valid.
+
+        If the action is invalid, raise an InvalidAction exception.
+        Return self.
+
+        Arguments:
+        action -- the action to be played
+        player -- the player who is playing
+
+        """
+        try:
+            if len(action) != 3:
+                raise InvalidAction(action, player)
+            if not self.is_action_valid(action, player):
+                raise InvalidAction(action, player)
+            kind, x, y = action
+            if kind == 'WH':
+                self.add_wall((x, y), True, player)
+            elif kind == 'WV':
+                self.add_wall((x, y), False, player)
+            elif kind == 'P':
+                self.move_pawn((x, y), player)
+            else:
+                raise InvalidAction(action, player)
+            return self
+        except Exception:
+            raise InvalidAction(action, player)
+
+    def play_action_with_no_check(self, action, player: int):
+        """Similar to play_action() but does no path existence test"""
+        self.play_code_with_no_check(encode_action(action), player)
+
+    def play_code_with_no_check(self, code: int, player: int):
+        """Similar to play_action_with_no_check() for the code of an action,
+        see quoridor.ACTIONS"""
+        if code < NB_PAWN_ACTIONS:
+            # The code of a pawn move is the index of its cell
+            self.pawn_bits[player] = 1 << code
+        else:
+            self.add_wall_with_no_check(ACTION_POSITIONS[code],
+                                        ACTION_KINDS[code] == KIND_WH, player)
+
+    def do_action(self, code: int, player: int):
+        """
+        Play the code of an action with no check in a way that undo can
+        revert, see CustomBoard.do_action
+
+        Returns:
+            The token to give to undo
+        """
+        token = (code, player, self.pawn_bits[player], self.horiz,
+                 self.verti, self.open_down, self.open_up, self.open_right,
+                 self.open_left)
+        self.play_code_with_no_check(code, player)
+        return token
+
+    def undo(self, token):
+        """Revert the action of a token returned by do_action"""
+        (code, player, self.pawn_bits[player], self.horiz, self.verti,
+         self.open_down, self.open_up, self.open_right,
+         self.open_left) = token
+        if code >= NB_PAWN_ACTIONS:
+            self.nb_walls[player] += 1
+
+    def zobrist_after(self, code: int, player: int):
+        """Returns the Zobrist hash of the position after player does the
+        action of a code, without playing it"""
+        if code < NB_PAWN_ACTIONS:
+            # The code of a pawn move is the index of its cell
+            return self.zobrist ^ \
+                ZOBRIST_PAWNS[player][self.pawn_bits[player].bit_length() - 1] ^ \
+                ZOBRIST_PAWNS[player][code]
+        return self.zobrist ^ ZOBRIST_WALL_ACTIONS[code] ^ \
+            ZOBRIST_NB_WALLS[player][self.nb_walls[player]] ^ \
+            ZOBRIST_NB_WALLS[player][self.nb_walls[player] - 1]
+
+    def is_finished(self):
+        """Return whether no more moves can be made (i.e.,
+        game finished).
+        """
+        return bool(self.pawn_bits[PLAYER1] & ROW_MASKS[self.goals[PLAYER1]]
+                    or self.pawn_bits[PLAYER2] &
+                    ROW_MASKS[self.goals[PLAYER2]])
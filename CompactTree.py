@@ -0,0 +1,208 @@
+####################################################################
+# 		* Simon, Sanmar (1938126)
+# 		* Harti, Ghali (1953494)
+####################################################################
+
+import random
+import threading
+from CustomBoard import CustomBoard
+from NodeStore import (FOLLOWING_SHORTEST_PATH, NO_ACTION, NO_PARENT,
+                       NodeStore, NodeView)
+from quoridor import NB_PAWN_ACTIONS
+from Rollout import StaticEvaluation
+from Tree import Tree, max_uct_slots
+
+
+class CompactTree(Tree):
+    """
+    MCTS tree keeping its nodes in a NodeStore instead of Node objects.
+    Only the board of the root is kept: the board of a node is rebuilt by
+    playing the actions from the root, and the last boards built are cached.
+    The nodes given to and returned by the methods of Tree are NodeView.
+    """
+
+    MAX_CACHED_BOARDS = 512
+
+    def __init__(self, player: int = 0, initial_board: CustomBoard = None,
+                 transposition_size: int = 0,
+                 progressive_widening: bool = False, rollout=None):
+        """
+        Tree constructor
+        Args:
+            player (int): The player
+            initial_board (CustomBoard): The initial board
+            transposition_size (int): Must be 0, the nodes of a compact tree
+                cannot be shared
+            progressive_widening (bool): Must be False, the children of a
+                node are all added at once
+            rollout: Simulation of the leaves, StaticEvaluation by default
+        """
+        if transposition_size > 0:
+            raise ValueError("CompactTree has no transposition table")
+        if progressive_widening:
+            raise ValueError("CompactTree has no progressive widening")
+        self.store = NodeStore()
+        self.root_index = self.store.append(NO_PARENT, NO_ACTION, 1 - player)
+        self.root_board = initial_board
+        self.boards = {}
+        self.transpositions = None
+        self.lock = threading.Lock()
+        # The children are never built, their walls are checked by expand
+        self.lazy_expansion = False
+        self.progressive_widening = False
+        self.rollout = rollout or StaticEvaluation()
+        self.nb_avoided_clones = 0
+        self.nb_avoided_wall_checks = 0
+
+    @property
+    def root(self) -> NodeView:
+        return NodeView(self, self.root_index)
+
+    def board_of(self, index: int) -> CustomBoard:
+        """Returns the board of a node, rebuilt from the nearest cached
+        board"""
+        if index == self.root_index:
+            return self.root_board
+        board = self.boards.get(index)
+        if board is not None:
+            return board
+
+        store = self.store
+        path = []
+        ancestor = index
+        while ancestor != self.root_index and ancestor not in self.boards:
+            path.append(ancestor)
+            ancestor = store.parent[ancestor]
+        board = self.board_of(ancestor).clone()
+        for node in reversed(path):
+            board.play_code_with_no_check(store.action[node],
+                                          store.player[node])
+
+        if len(self.boards) >= self.MAX_CACHED_BOARDS:
+            self.boards.clear()
+        self.boards[index] = board
+        return board
+
+    def advance_root(self, board: CustomBoard) -> bool:
+        """
+        Move the root two plies down, to the grandchild having the position
+        of board. The grandchildren are walked on the root board, with
+        do_action and undo. The subtree of the new root is copied to a new
+        store, so the rest of the tree is freed.
+
+        Args:
+            board (CustomBoard): The board received for the new move
+
+        Returns:
+            bool: True if the position was found in the tree
+        """
+        store = self.store
+        root_board = self.root_board
+        for child in store.children(self.root_index):
+            if store.nb_children[child] == 0:
+                continue
+            child_token = root_board.do_action(store.action[child],
+                                               store.player[child])
+            for grandchild in store.children(child):
+                action = store.action[grandchild]
+                player = store.player[grandchild]
+                if root_board.zobrist_after(action, player) != board.zobrist:
+                    continue
+                token = root_board.do_action(action, player)
+                if tuple(root_board.pawns) == tuple(board.pawns):
+                    # The root board is left on the new root
+                    self.store = store.copy_subtree(grandchild)
+                    self.root_index = 0
+                    self.boards = {}
+                    return True
+                root_board.undo(token)
+            root_board.undo(child_token)
+        return False
+
+    def getInterestingNode(self, start: NodeView = None) -> NodeView:
+        """
+        If there are multiple nodes giving the highest UCT,
+        the node going into the direction of the shortest path is prioritized
+        Args:
+            start (NodeView): The node where the selection starts, the root
+                by default
+        Returns:
+            NodeView: The best Node
+        """
+        store = self.store
+        U = store.U
+        N = store.N
+        index = self.root_index if start is None else start.index
+
+        while store.nb_children[index] != 0 and N[index] > 0:
+            first = store.first_child[index]
+            last = first + store.nb_children[index]
+            nodes_max_uct = [first + i for i in max_uct_slots(
+                U[first:last], N[first:last], N[index])]
+
+            nodes_max_uct_after_shortest_path = [
+                n for n in nodes_max_uct
+                if store.flags[n] & FOLLOWING_SHORTEST_PATH]
+            pawns_nodes_max_uct = [n for n in nodes_max_uct
+                                   if store.action[n] < NB_PAWN_ACTIONS]
+
+            if len(nodes_max_uct_after_shortest_path) > 0:
+                index = random.choice(nodes_max_uct_after_shortest_path)
+            elif len(pawns_nodes_max_uct):
+                index = random.choice(pawns_nodes_max_uct)
+            else:
+                index = random.choice(nodes_max_uct)
+
+        return NodeView(self, index)
+
+    def expand(self, node: NodeView) -> NodeView:
+        """
+        Expand a specific node: its children are added to the store, without
+        building their boards
+
+        Returns:
+            NodeView: The random leaf node after the expanding the most
+                promising node
+        """
+        current_board = self.board_of(node.index)
+        if current_board.is_finished():
+            return node
+
+        player = 1 - self.store.player[node.index]
+        child_actions = self.get_child_actions(current_board, player)
+        first = self.store.add_children(
+            node.index, player,
+            [action for action, _ in child_actions],
+            [FOLLOWING_SHORTEST_PATH if following_shortest_path else 0
+             for _, following_shortest_path in child_actions])
+        return NodeView(self, first + random.randrange(len(child_actions)))
+
+    def backPropagate(self, node: NodeView, simulation_result: int,
+                      virtual_loss: int = 0):
+        """
+        Propagate the scores from the leaf to the root
+
+        Args:
+            node (NodeView): The node from which to propagate the simulation
+                result
+            simulation_result (int): 1 if player won and 0 if player lost
+            virtual_loss (int): Virtual loss added on the path by
+                add_virtual_loss, removed here
+        """
+        store = self.store
+        index = node.index
+        while index != NO_PARENT:
+            store.U[index] += simulation_result
+            store.N[index] += 1 - virtual_loss
+            index = store.parent[index]
+
+    def add_virtual_loss(self, node: NodeView):
+        """
+        Count VIRTUAL_LOSS lost simulations on the path from the root to
+        node, until its result is back propagated
+        """
+        store = self.store
+        index = node.index
+        while index != NO_PARENT:
+            store.N[index] += self.VIRTUAL_LOSS
+            index = store.parent[index]
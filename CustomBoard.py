@@ -3,9 +3,93 @@
 # # 		* Harti, Ghali (1953494)
 # ####################################################################
 
-import heapq
+import itertools
+import random
+from collections import deque
+
+from quoridor import (ACTION_KINDS, ACTION_POSITIONS, KIND_WH,
+                      NB_PAWN_ACTIONS, PLAYER1, PLAYER2, WALL_CONFLICTS,
+                      InvalidAction, NoPath, cut_players, encode_action,
+                      goal_distance_map, legal_pawn_moves, legal_wall_mask,
+                      open_dirs_grid, open_neighbors, path_from_distance_map,
+                      set_wall_edges, shortest_path_edges, wall_index)
+
+# The wall connectivity index works on the 10 x 10 wall corners: corner
+# (i, j) is the top-left corner of cell (i, j). All the border corners
+# are merged into BORDER.
+NB_CORNERS = 10
+BORDER = NB_CORNERS * NB_CORNERS
+
+
+def wall_corners(pos, is_horiz):
+    """Returns the three corners (two ends and middle) touched by a wall"""
+    (x, y) = pos
+    if is_horiz:
+        return ((x + 1) * NB_CORNERS + y, (x + 1) * NB_CORNERS + y + 1,
+                (x + 1) * NB_CORNERS + y + 2)
+    return (x * NB_CORNERS + y + 1, (x + 1) * NB_CORNERS + y + 1,
+            (x + 2) * NB_CORNERS + y + 1)
+
+
+def new_corner_parents():
+    """Returns the union-find parents of the corners of an empty board"""
+    parents = list(range(BORDER + 1))
+    for i in range(NB_CORNERS):
+        for j in range(NB_CORNERS):
+            if i in (0, NB_CORNERS - 1) or j in (0, NB_CORNERS - 1):
+                parents[i * NB_CORNERS + j] = BORDER
+    return parents
+
+
+# Zobrist keys: one per pawn square, per wall slot, per number of walls
+# left and one for the side to move
+ZOBRIST_MAX_WALLS = 20
+_zobrist_random = random.Random(8215)
+ZOBRIST_PAWNS = [[_zobrist_random.getrandbits(64) for cell in range(81)]
+                 for player in range(2)]
+ZOBRIST_WALLS = [[_zobrist_random.getrandbits(64) for slot in range(64)]
+                 for is_horiz in range(2)]
+ZOBRIST_NB_WALLS = [[_zobrist_random.getrandbits(64)
+                     for nb in range(ZOBRIST_MAX_WALLS + 1)]
+                    for player in range(2)]
+ZOBRIST_SIDE = _zobrist_random.getrandbits(64)
+# Key of the wall of each action code, see quoridor.ACTIONS
+ZOBRIST_WALL_ACTIONS = [0] * NB_PAWN_ACTIONS + ZOBRIST_WALLS[True] + \
+    ZOBRIST_WALLS[False]
+
+
+class PathCache:
+    """
+    Shortest paths memoized by (wall version, player, pawns).
+    A cache is shared by a board and all the boards cloned from it. Each
+    wall placement gives the board a new wall version, so entries are only
+    reused between boards with the same walls.
+    """
+
+    def __init__(self, max_entries=200000):
+        self.entries = {}
+        self.max_entries = max_entries
+        # next() on a count is atomic, so threads never share a version
+        self.versions = itertools.count(1)
+        self.hits = 0
+        self.misses = 0
+
+    def new_version(self):
+        """Returns a wall version that no board used yet"""
+        return next(self.versions)
+
+    def get(self, key):
+        """Returns the path stored for key (None for no path) or raises
+        KeyError"""
+        path = self.entries[key]
+        self.hits += 1
+        return path
 
-from quoridor import PLAYER1, PLAYER2, InvalidAction, NoPath
+    def put(self, key, path):
+        self.misses += 1
+        if len(self.entries) >= self.max_entries:
+            self.entries.clear()
+        self.entries[key] = path
 
 
 class CustomBoard:
@@ -13,6 +97,16 @@ class CustomBoard:
     Quoridor Board with more functions to do some custom action.
     """
 
+    __slots__ = ('pawns', 'goals', 'nb_walls', 'horiz_walls', 'verti_walls',
+                 'open_dirs', 'distance_maps', 'path_cache', 'wall_version',
+                 'zobrist', 'path_edges', 'corner_parents', 'blocked_slots')
+
+    # The same for every board
+    size = 9
+    rows = size
+    cols = size
+    starting_walls = 10
+
     def __init__(self, percepts=None):
         """
         Constructor of the representation for a quoridor game of size 9.
@@ -23,10 +117,6 @@ class CustomBoard:
             each player owns 10 walls and there is initially no wall on the
             board
         """
-        self.size = 9
-        self.rows = self.size
-        self.cols = self.size
-        self.starting_walls = 10
         self.pawns = [(0, 4), (8, 4)]
         self.goals = [8, 0]
         self.nb_walls = [self.starting_walls, self.starting_walls]
@@ -34,9 +124,10 @@ class CustomBoard:
         self.verti_walls = []
 
         if percepts is not None:
-            self.pawns[0] = percepts['pawns'][0]
+            # Positions come as lists through XML-RPC
+            self.pawns[0] = tuple(percepts['pawns'][0])
             self.goals[0] = percepts['goals'][0]
-            self.pawns[1] = percepts['pawns'][1]
+            self.pawns[1] = tuple(percepts['pawns'][1])
             self.goals[1] = percepts['goals'][1]
             for (x, y) in percepts['horiz_walls']:
                 self.horiz_walls.append((x, y))
@@ -44,6 +135,29 @@ class CustomBoard:
                 self.verti_walls.append((x, y))
             self.nb_walls[0] = percepts['nb_walls'][0]
             self.nb_walls[1] = percepts['nb_walls'][1]
+        # Open directions of each cell, kept up to date on wall placement
+        self.open_dirs = open_dirs_grid(self.size, self.horiz_walls,
+                                        self.verti_walls)
+        # Goal distance maps of both players, cached until the next wall
+        self.distance_maps = [None, None]
+        # Shortest paths memoized for the current walls
+        self.path_cache = PathCache()
+        self.wall_version = self.path_cache.new_version()
+        # Position hash, updated by each action
+        self.zobrist = self.compute_zobrist()
+        # Edges used by the shortest paths, cached until the next action
+        self.path_edges = None
+        # Union-find of the corners linked by walls or by the border
+        self.corner_parents = new_corner_parents()
+        # Mask of the wall slots taken or crossed by a wall (see
+        # quoridor.WALL_CONFLICTS)
+        self.blocked_slots = 0
+        for (x, y) in self.horiz_walls:
+            self.link_wall_corners((x, y), True)
+            self.blocked_slots |= WALL_CONFLICTS[wall_index((x, y), True)]
+        for (x, y) in self.verti_walls:
+            self.link_wall_corners((x, y), False)
+            self.blocked_slots |= WALL_CONFLICTS[wall_index((x, y), False)]
 
     def pretty_print(self):
         """print of the representation"""
@@ -88,19 +202,44 @@ class CustomBoard:
         return board_str
 
     def clone(self):
-        """Return a clone of this object."""
-        clone_board = CustomBoard()
-        clone_board.pawns[0] = self.pawns[0]
-        clone_board.pawns[1] = self.pawns[1]
-        clone_board.goals[0] = self.goals[0]
-        clone_board.goals[1] = self.goals[1]
-        clone_board.nb_walls[0] = self.nb_walls[0]
-        clone_board.nb_walls[1] = self.nb_walls[1]
+        """Return a clone of this object.
+        The wall structures (wall lists, open edges, distance maps and
+        corner union-find) are shared with the clone: a wall placement
+        replaces them instead of changing them in place.
+        """
+        clone_board = CustomBoard.__new__(CustomBoard)
+        clone_board.pawns = self.pawns[:]
+        clone_board.goals = self.goals
+        clone_board.nb_walls = self.nb_walls[:]
+        clone_board.horiz_walls = self.horiz_walls
+        clone_board.verti_walls = self.verti_walls
+        clone_board.open_dirs = self.open_dirs
+        clone_board.distance_maps = self.distance_maps
+        clone_board.path_cache = self.path_cache
+        clone_board.wall_version = self.wall_version
+        clone_board.zobrist = self.zobrist
+        clone_board.path_edges = self.path_edges
+        clone_board.corner_parents = self.corner_parents
+        clone_board.blocked_slots = self.blocked_slots
+        return clone_board
+
+    def compute_zobrist(self):
+        """
+        Returns the Zobrist hash of the position from scratch. The side to
+        move is the one of this board: each action toggles it, so boards
+        derived from the same board get the same hash for the same position
+        and player to move.
+        """
+        zobrist = 0
+        for player in (PLAYER1, PLAYER2):
+            (x, y) = self.pawns[player]
+            zobrist ^= ZOBRIST_PAWNS[player][x * self.size + y]
+            zobrist ^= ZOBRIST_NB_WALLS[player][self.nb_walls[player]]
         for (x, y) in self.horiz_walls:
-            clone_board.horiz_walls.append((x, y))
+            zobrist ^= ZOBRIST_WALLS[True][x * (self.size - 1) + y]
         for (x, y) in self.verti_walls:
-            clone_board.verti_walls.append((x, y))
-        return clone_board
+            zobrist ^= ZOBRIST_WALLS[False][x * (self.size - 1) + y]
+        return zobrist
 
     def can_move_here(self, i, j, player):
         """Returns true if the player can move to (i, j),
@@ -109,71 +248,13 @@ class CustomBoard:
         return self.is_pawn_move_ok(self.pawns[player], (i, j),
                                     self.pawns[(player + 1) % 2])
 
-    def is_simplified_pawn_move_ok(self, former_pos, new_pos):
-        """Returns True if moving one pawn from former_pos to new_pos
-        is valid i.e. it respects the rules of quoridor (without the
-        heap move above the opponent)
-        """
-        (row_form, col_form) = former_pos
-        (row_new, col_new) = new_pos
-
-        if (row_form == row_new and col_form == col_new) or \
-            row_new >= self.size or row_new < 0 or \
-            col_new >= self.size or col_new < 0:
-            return False
-        wall_right = ((row_form, col_form) in self.verti_walls) or \
-                     ((row_form - 1, col_form) in self.verti_walls)
-        wall_left = ((row_form - 1, col_form - 1) in self.verti_walls) or \
-                    ((row_form, col_form - 1) in self.verti_walls)
-        wall_up = ((row_form - 1, col_form - 1) in self.horiz_walls) or \
-                  ((row_form - 1, col_form) in self.horiz_walls)
-        wall_down = ((row_form, col_form) in self.horiz_walls) or \
-                    ((row_form, col_form - 1) in self.horiz_walls)
-
-        # check that the pawn doesn't move through a wall
-        if row_new == row_form + 1 and col_new == col_form:
-            return not wall_down
-        if row_new == row_form - 1 and col_new == col_form:
-            return not wall_up
-        if row_new == row_form and col_new == col_form + 1:
-            return not wall_right
-        if row_new == row_form and col_new == col_form - 1:
-            return not wall_left
-        return False
-
     def is_pawn_move_ok(self, former_pos, new_pos, opponent_pos):
         """Returns True if moving one pawn from former_pos to new_pos is
         valid i.e. it respects the rules of quoridor
         """
-        (x_form, y_form) = former_pos
         (x_new, y_new) = new_pos
-        (x_op, y_op) = opponent_pos
-
-        if (x_op == x_new and y_op == y_new) or \
-            (x_form == x_new and y_form == y_new):
-            return False
-
-        # Move of 2 (above the opponent pawn) or diagonal
-        def manhattan(pos1, pos2):
-            return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
-
-        if manhattan(former_pos, opponent_pos) + \
-                manhattan(opponent_pos, new_pos) == 2:
-            ok = self.is_pawn_move_ok(opponent_pos, new_pos, (-10, -10)) and \
-                 self.is_pawn_move_ok(former_pos, opponent_pos, (-10, -10))
-            if not ok:
-                return False
-            # Check if the move is in straight angle that there were no
-            # possibility of moving straight ahead
-            if abs(x_form - x_new) ** 2 + abs(y_form - y_new) ** 2 == 2:
-                # There is a possibility of moving straight ahead leading the
-                # move to be illegal
-                return not self.is_pawn_move_ok(opponent_pos,
-                                                (x_op + (x_op - x_form),
-                                                 y_op + (y_op - y_form)),
-                                                (-10, -10))
-            return True
-        return self.is_simplified_pawn_move_ok(former_pos, new_pos)
+        return (x_new, y_new) in legal_pawn_moves(self.open_dirs, former_pos,
+                                                  opponent_pos)
 
     def paths_exist(self):
         """Returns True if there exists a path from both players to
@@ -186,43 +267,73 @@ class CustomBoard:
         except NoPath:
             return False
 
+    def distance_map(self, player):
+        """Returns the grid of distances to the goal row of player,
+        ignoring the pawns (see goal_distance_map). It is kept until the
+        next wall is placed.
+        """
+        if self.distance_maps[player] is None:
+            self.distance_maps[player] = goal_distance_map(
+                self.open_dirs, self.goals[player])
+        return self.distance_maps[player]
+
     def get_shortest_path(self, player):
         """ Returns a shortest path for player to reach its goal
         if player is on its goal, the shortest path is an empty list
         if no path exists, exception is thrown.
-        This new implementation use A* search
+        The path is read on the distance map unless the opponent is in the
+        way, in which case a BFS is done. Paths are memoized in the
+        path cache.
         """
+        if self.pawns[player][0] == self.goals[player]:
+            return []
+        key = (self.wall_version, player, self.pawns[0], self.pawns[1])
+        try:
+            path = self.path_cache.get(key)
+        except KeyError:
+            try:
+                path = path_from_distance_map(self.distance_map(player),
+                                              self.open_dirs,
+                                              self.pawns[player],
+                                              self.pawns[(player + 1) % 2])
+                if path is None:
+                    path = self.search_shortest_path(player)
+                path = tuple(path)
+            except NoPath:
+                path = None
+            self.path_cache.put(key, path)
+        if path is None:
+            raise NoPath()
+        return list(path)
+
+    def search_shortest_path(self, player, open_dirs=None):
+        """Returns a shortest path for player, searched with a BFS that
+        takes the opponent pawn into account. The open edges searched are
+        open_dirs if given, those of the board otherwise.
+        """
+        if open_dirs is None:
+            open_dirs = self.open_dirs
+        (x_op, y_op) = self.pawns[(player + 1) % 2]
 
         def get_pawn_moves(pos):
             (x, y) = pos
-            positions = [(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1),
-                         (x + 1, y + 1), (x - 1, y - 1), (x + 1, y - 1),
-                         (x - 1, y + 1),
-                         (x + 2, y), (x - 2, y), (x, y + 2), (x, y - 2)]
-            moves = []
-            for new_pos in positions:
-                if self.is_pawn_move_ok(pos, new_pos,
-                                        self.pawns[(player + 1) % 2]):
-                    moves.append(new_pos)
-            return moves
-
-        def heuristic(pos):
-            return abs(pos[0] - self.goals[player])
+            if abs(x - x_op) + abs(y - y_op) != 1:
+                # No jump possible: the open edges are the moves
+                return open_neighbors(open_dirs, pos)
+            return legal_pawn_moves(open_dirs, pos, (x_op, y_op))
 
         (a, b) = self.pawns[player]
         if a == self.goals[player]:
             return []
+        # Cells already queued by the BFS
         visited = [[False for i in range(self.size)] for i in range(self.size)]
         # Predecessor matrix in the BFS
         prede = [[None for i in range(self.size)] for i in range(self.size)]
-        neighbors = []
-        heapq.heappush(neighbors,
-                       (heuristic(self.pawns[player]), (0, self.pawns[player])))
-
+        neighbors = deque([self.pawns[player]])
+        visited[a][b] = True
         while len(neighbors) > 0:
-            heuristic_distance, (distance, neighbor) = heapq.heappop(neighbors)
+            neighbor = neighbors.popleft()
             (x, y) = neighbor
-            visited[x][y] = True
             if x == self.goals[player]:
                 succ = [neighbor]
                 curr = prede[x][y]
@@ -232,16 +343,12 @@ class CustomBoard:
                     curr = prede[x_][y_]
                 succ.reverse()
                 return succ
-            unvisited_succ = [(x_, y_) for (x_, y_) in get_pawn_moves(neighbor)
-                              if not visited[x_][y_]]
-            for n_ in unvisited_succ:
+            for n_ in get_pawn_moves(neighbor):
                 (x_, y_) = n_
-                if visited[x_][y_]:
-                    continue
-                new_distance = distance + 1
-                new_heuristic = new_distance + heuristic(n_)
-                heapq.heappush(neighbors, (new_heuristic, (new_distance, n_)))
-                prede[x_][y_] = neighbor
+                if not visited[x_][y_]:
+                    visited[x_][y_] = True
+                    neighbors.append(n_)
+                    prede[x_][y_] = neighbor
         raise NoPath()
 
     def min_steps_before_victory(self, player):
@@ -259,11 +366,10 @@ class CustomBoard:
         except NoPath:
             print("No path exception")
             print(self)
-            temp = self.pawns[1 - player]
-            self.pawns[1 - player] = self.pawns[player]
-            shortest_path_length = len(self.get_shortest_path(player))
-            self.pawns[1 - player] = temp
-            return shortest_path_length
+            # The pawns of the board may be read by other threads
+            board = self.clone()
+            board.pawns[1 - player] = board.pawns[player]
+            return len(board.get_shortest_path(player))
 
     def add_wall(self, pos, is_horiz, player):
         """Player adds a wall in position pos. The wall is horizontal
@@ -274,90 +380,166 @@ class CustomBoard:
         if self.nb_walls[player] <= 0 or \
             not self.is_wall_possible_here(pos, is_horiz):
             return
-        if is_horiz:
-            self.horiz_walls.append(pos)
-        else:
-            self.verti_walls.append(pos)
-        self.nb_walls[player] -= 1
+        self.add_wall_with_no_check(pos, is_horiz, player)
 
     def add_wall_with_no_check(self, pos, is_horiz, player):
+        # The wall structures may be shared with clones, see clone
         if is_horiz:
-            self.horiz_walls.append(pos)
+            self.horiz_walls = self.horiz_walls + [pos]
         else:
-            self.verti_walls.append(pos)
+            self.verti_walls = self.verti_walls + [pos]
+        self.open_dirs = self.open_dirs_with_wall(pos, is_horiz)
+        self.corner_parents = self.corner_parents[:]
+        self.link_wall_corners(pos, is_horiz)
+        self.blocked_slots |= WALL_CONFLICTS[wall_index(pos, is_horiz)]
+        self.distance_maps = [None, None]
+        self.wall_version = self.path_cache.new_version()
+        self.path_edges = None
+        (x, y) = pos
+        self.zobrist ^= ZOBRIST_WALLS[is_horiz][x * (self.size - 1) + y] ^ \
+            ZOBRIST_NB_WALLS[player][self.nb_walls[player]] ^ \
+            ZOBRIST_NB_WALLS[player][self.nb_walls[player] - 1] ^ \
+            ZOBRIST_SIDE
         self.nb_walls[player] -= 1
 
+    def open_dirs_with_wall(self, pos, is_horiz):
+        """Returns a copy of open_dirs with the edges cut by a wall closed.
+        Only the two rows changed are copied, the others are shared.
+        """
+        (x, _) = pos
+        open_dirs = self.open_dirs[:]
+        open_dirs[x] = open_dirs[x][:]
+        open_dirs[x + 1] = open_dirs[x + 1][:]
+        set_wall_edges(open_dirs, pos, is_horiz, False)
+        return open_dirs
+
+    def find_corner(self, corner):
+        """Returns the representative of the component of a corner"""
+        parents = self.corner_parents
+        while parents[corner] != corner:
+            parents[corner] = parents[parents[corner]]
+            corner = parents[corner]
+        return corner
+
+    def link_wall_corners(self, pos, is_horiz):
+        """Merges the components of the corners touched by a new wall"""
+        first, middle, last = wall_corners(pos, is_horiz)
+        root = self.find_corner(first)
+        for corner in (middle, last):
+            other = self.find_corner(corner)
+            if other != root:
+                # Keep BORDER as the representative of its component
+                if other == BORDER:
+                    root, other = other, root
+                self.corner_parents[other] = root
+
+    def can_close_barrier(self, pos, is_horiz):
+        """
+        Returns False if the wall cannot disconnect any player from its
+        goal, i.e. its corners are in three different components of the
+        walls and the border. The cells of both pawns count as closed
+        squares since a pawn can block the path of the other player.
+        """
+        roots = [self.find_corner(c) for c in wall_corners(pos, is_horiz)]
+        squares = []
+        for (x, y) in self.pawns:
+            corner = x * NB_CORNERS + y
+            square = {self.find_corner(c) for c in
+                      (corner, corner + 1, corner + NB_CORNERS,
+                       corner + NB_CORNERS + 1)}
+            if squares and not squares[0].isdisjoint(square):
+                squares[0] |= square
+            else:
+                squares.append(square)
+        labels = set()
+        for root in roots:
+            for k, square in enumerate(squares):
+                if root in square:
+                    root = -1 - k
+                    break
+            labels.add(root)
+        return len(labels) < 3
+
     def move_pawn(self, new_pos, player):
         """Modifies the state of the board to take into account the
         new position of the pawn of player.
         """
+        (x, y) = self.pawns[player]
+        (x_, y_) = new_pos
+        self.zobrist ^= ZOBRIST_PAWNS[player][x * self.size + y] ^ \
+            ZOBRIST_PAWNS[player][x_ * self.size + y_] ^ ZOBRIST_SIDE
         self.pawns[player] = new_pos
+        self.path_edges = None
 
     def is_wall_possible_here(self, pos, is_horiz):
         """
         Returns True if it is possible to put a wall in position pos
         with direction specified by is_horiz.
+        Paths are only searched again if the wall may close a barrier and
+        cuts one of the current shortest paths, or if a player has no path
+        already (the opponent pawn blocking its only corridor).
+        """
+        if not self.is_wall_slot_free(pos, is_horiz):
+            return False
+        paths = self.get_path_edges()
+        if paths is not None and not self.can_close_barrier(pos, is_horiz):
+            return True
+        cut = cut_players(paths, pos, is_horiz)
+        return not cut or self.wall_keeps_paths(pos, is_horiz, cut)
+
+    def is_wall_slot_free(self, pos, is_horiz):
+        """Returns True if a wall in position pos would be on the board
+        without overlapping or crossing another wall.
         """
         (x, y) = pos
         if x >= self.size - 1 or x < 0 or y >= self.size - 1 or y < 0:
             return False
-        if not (tuple(pos) in self.horiz_walls or
-                tuple(pos) in self.verti_walls):
-            wall_horiz_right = (x, y + 1) in self.horiz_walls
-            wall_horiz_left = (x, y - 1) in self.horiz_walls
-            wall_vert_up = (x - 1, y) in self.verti_walls
-            wall_vert_down = (x + 1, y) in self.verti_walls
-            if is_horiz:
-                if wall_horiz_right or wall_horiz_left:
-                    return False
-                self.horiz_walls.append(tuple(pos))
-                if not self.paths_exist():
-                    a = self.horiz_walls.pop()
-                    return False
-                self.horiz_walls.pop()
-                return True
-            else:
-                if wall_vert_up or wall_vert_down:
-                    return False
-                self.verti_walls.append(tuple(pos))
-                if not self.paths_exist():
-                    a = self.verti_walls.pop()
-                    return False
-                self.verti_walls.pop()
-                return True
-        else:
+        return not self.blocked_slots >> wall_index(pos, is_horiz) & 1
+
+    def wall_keeps_paths(self, pos, is_horiz, players=(PLAYER1, PLAYER2)):
+        """Returns True if every player of players still has a path to its
+        goal once the wall is put in position pos.
+        """
+        # The board is left unchanged: other threads may be reading it
+        open_dirs = self.open_dirs_with_wall(pos, is_horiz)
+        try:
+            for player in players:
+                self.search_shortest_path(player, open_dirs)
+            return True
+        except NoPath:
             return False
 
+    def get_path_edges(self):
+        """Returns the edges crossed by the shortest paths of both players
+        (see shortest_path_edges), or None if one of them has no path.
+        """
+        if self.path_edges is None:
+            try:
+                self.path_edges = [shortest_path_edges(self, PLAYER1),
+                                   shortest_path_edges(self, PLAYER2)]
+            except NoPath:
+                self.path_edges = []
+        return self.path_edges or None
+
     def get_legal_pawn_moves(self, player):
         """Returns legal moves for the pawn of player."""
-        (x, y) = self.pawns[player]
-        positions = [(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1),
-                     (x + 1, y + 1), (x - 1, y - 1), (x + 1, y - 1),
-                     (x - 1, y + 1),
-                     (x + 2, y), (x - 2, y), (x, y + 2), (x, y - 2)]
-        moves = []
-        for new_pos in positions:
-            if self.is_pawn_move_ok(self.pawns[player], new_pos,
-                                    self.pawns[(player + 1) % 2]):
-                moves.append(('P', new_pos[0], new_pos[1]))
-        return moves
+        return [('P', x, y) for (x, y) in legal_pawn_moves(
+            self.open_dirs, self.pawns[player], self.pawns[(player + 1) % 2])]
 
     def get_legal_wall_moves(self, player):
         """Returns legal wall placements (adding a wall
         somewhere) for player.
         """
-        positions = []
         moves = []
         if self.nb_walls[player] <= 0:
             return moves
+        mask = legal_wall_mask(self, self.get_path_edges())
         for i in range(self.size - 1):
             for j in range(self.size - 1):
-                positions.append((i, j))
-        for pos in positions:
-            if self.is_wall_possible_here(pos, True):
-                moves.append(('WH', pos[0], pos[1]))
-            if self.is_wall_possible_here(pos, False):
-                moves.append(('WV', pos[0], pos[1]))
+                if mask >> wall_index((i, j), True, self.size) & 1:
+                    moves.append(('WH', i, j))
+                if mask >> wall_index((i, j), False, self.size) & 1:
+                    moves.append(('WV', i, j))
         return moves
 
     def get_actions(self, player):
@@ -415,13 +597,57 @@ class CustomBoard:
 
     def play_action_with_no_check(self, action, player: int):
         """Similar to play_action() but does no path existence test"""
-        kind, x, y = action
-        if kind == 'WH':
-            self.add_wall_with_no_check((x, y), True, player)
-        elif kind == 'WV':
-            self.add_wall_with_no_check((x, y), False, player)
-        elif kind == 'P':
-            self.move_pawn((x, y), player)
+        self.play_code_with_no_check(encode_action(action), player)
+
+    def play_code_with_no_check(self, code: int, player: int):
+        """Similar to play_action_with_no_check() for the code of an action,
+        see quoridor.ACTIONS"""
+        if code < NB_PAWN_ACTIONS:
+            self.move_pawn(ACTION_POSITIONS[code], player)
+        else:
+            self.add_wall_with_no_check(ACTION_POSITIONS[code],
+                                        ACTION_KINDS[code] == KIND_WH, player)
+
+    def do_action(self, code: int, player: int):
+        """
+        Play the code of an action with no check, like
+        play_code_with_no_check, in a way that undo can revert: the board is
+        updated in place instead of being cloned. The actions must be undone
+        in the reverse order they were done.
+
+        Returns:
+            The token to give to undo
+        """
+        token = (code, player, self.pawns[player], self.zobrist,
+                 self.path_edges, self.wall_version, self.blocked_slots,
+                 self.horiz_walls, self.verti_walls, self.open_dirs,
+                 self.distance_maps, self.corner_parents)
+        self.play_code_with_no_check(code, player)
+        return token
+
+    def undo(self, token):
+        """Revert the action of a token returned by do_action. The paths
+        cached for the walls restored are still valid."""
+        (code, player, pawn, self.zobrist, self.path_edges,
+         self.wall_version, self.blocked_slots, self.horiz_walls,
+         self.verti_walls, self.open_dirs, self.distance_maps,
+         self.corner_parents) = token
+        if code < NB_PAWN_ACTIONS:
+            self.pawns[player] = pawn
+        else:
+            self.nb_walls[player] += 1
+
+    def zobrist_after(self, code: int, player: int):
+        """Returns the Zobrist hash of the position after player does the
+        action of a code, without playing it"""
+        if code < NB_PAWN_ACTIONS:
+            # The code of a pawn move is the index of its cell
+            (x_, y_) = self.pawns[player]
+            return self.zobrist ^ ZOBRIST_PAWNS[player][x_ * self.size + y_] ^ \
+                ZOBRIST_PAWNS[player][code] ^ ZOBRIST_SIDE
+        return self.zobrist ^ ZOBRIST_WALL_ACTIONS[code] ^ \
+            ZOBRIST_NB_WALLS[player][self.nb_walls[player]] ^ \
+            ZOBRIST_NB_WALLS[player][self.nb_walls[player] - 1] ^ ZOBRIST_SIDE
 
     def is_finished(self):
         """Return whether no more moves can be made (i.e.,
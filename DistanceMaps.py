@@ -0,0 +1,133 @@
+####################################################################
+# 		* Simon, Sanmar (1938126)
+# 		* Harti, Ghali (1953494)
+####################################################################
+"""
+Goal distance maps of many boards at once, computed with NumPy.
+
+A board is encoded by two 64-bit wall masks, horizontal then vertical, the
+wall at (x, y) being the bit x * 8 + y (see quoridor.wall_index). The maps
+of a stack of B boards are computed by one breadth-first search from the
+goal rows, expanding the frontiers of all the boards and both players in
+each step. Like quoridor.goal_distance_map, the pawns are ignored.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+from quoridor import NB_PAWN_ACTIONS
+
+SIZE = 9
+NB_CELLS = SIZE * SIZE
+
+# Distance of the cells from which a goal row cannot be reached
+UNREACHABLE = NB_CELLS
+
+NB_WALL_SLOTS = (SIZE - 1) ** 2
+WALL_BITS = np.arange(NB_WALL_SLOTS, dtype=np.uint64)
+
+
+def wall_masks(board) -> Tuple[int, int]:
+    """Returns the horizontal and vertical wall masks of a board"""
+    horiz = 0
+    for (x, y) in board.horiz_walls:
+        horiz |= 1 << (x * (SIZE - 1) + y)
+    verti = 0
+    for (x, y) in board.verti_walls:
+        verti |= 1 << (x * (SIZE - 1) + y)
+    return horiz, verti
+
+
+def stack_wall_masks(board, actions) -> np.ndarray:
+    """
+    Returns the wall masks of the boards reached from board by each action,
+    preceded by the masks of board itself
+
+    Args:
+        board: The board (CustomBoard or BitBoard)
+        actions: The action codes, the pawn moves keep the walls of board
+
+    Returns:
+        np.ndarray: The (len(actions) + 1, 2) wall masks
+    """
+    horiz, verti = wall_masks(board)
+    masks = np.empty((len(actions) + 1, 2), dtype=np.uint64)
+    masks[:] = (horiz, verti)
+    for i, action in enumerate(actions, 1):
+        if action >= NB_PAWN_ACTIONS:
+            is_verti, slot = divmod(action - NB_PAWN_ACTIONS, NB_WALL_SLOTS)
+            masks[i, is_verti] |= np.uint64(1 << slot)
+    return masks
+
+
+def distance_maps(masks: np.ndarray, goals) -> np.ndarray:
+    """
+    Compute the goal distance maps of both players on a stack of boards
+
+    Args:
+        masks (np.ndarray): The (B, 2) wall masks of the boards
+        goals: The goal rows of both players
+
+    Returns:
+        np.ndarray: The (B, 2, 9, 9) number of steps needed to reach the goal
+            row of each player from each cell, UNREACHABLE if there is no
+            path
+    """
+    nb_boards = len(masks)
+    walls = ((masks[:, :, None] >> WALL_BITS) & np.uint64(1)).astype(bool)
+    walls = walls.reshape(nb_boards, 2, SIZE - 1, SIZE - 1)
+    horiz = ~walls[:, 0]
+    verti = ~walls[:, 1]
+
+    # A horizontal wall at (x, y) cuts the moves between rows x and x + 1 in
+    # the columns y and y + 1, a vertical one between columns y and y + 1 in
+    # the rows x and x + 1
+    open_down = np.ones((nb_boards, 1, SIZE - 1, SIZE), dtype=bool)
+    open_down[:, 0, :, :-1] &= horiz
+    open_down[:, 0, :, 1:] &= horiz
+    open_right = np.ones((nb_boards, 1, SIZE, SIZE - 1), dtype=bool)
+    open_right[:, 0, :-1, :] &= verti
+    open_right[:, 0, 1:, :] &= verti
+
+    distances = np.full((nb_boards, 2, SIZE, SIZE), UNREACHABLE,
+                        dtype=np.int8)
+    frontier = np.zeros((nb_boards, 2, SIZE, SIZE), dtype=bool)
+    frontier[:, 0, goals[0]] = True
+    frontier[:, 1, goals[1]] = True
+    reached = frontier.copy()
+    distances[frontier] = 0
+    distance = 0
+    while True:
+        distance += 1
+        new = np.zeros_like(frontier)
+        new[:, :, :-1] |= frontier[:, :, 1:] & open_down
+        new[:, :, 1:] |= frontier[:, :, :-1] & open_down
+        new[:, :, :, :-1] |= frontier[:, :, :, 1:] & open_right
+        new[:, :, :, 1:] |= frontier[:, :, :, :-1] & open_right
+        new &= ~reached
+        if not new.any():
+            return distances
+        reached |= new
+        distances[new] = distance
+        frontier = new
+
+
+def batch_min_steps(boards) -> List[Tuple[int, int]]:
+    """
+    Evaluator of Tree.batch_iteration computing the distance maps of all the
+    boards in one call. Unlike evaluate_boards, the pawns do not block each
+    other.
+
+    Returns:
+        List[Tuple[int, int]]: The minimum steps before victory of both
+            players on each board, UNREACHABLE if there is no path
+    """
+    masks = np.array([wall_masks(board) for board in boards],
+                     dtype=np.uint64).reshape(-1, 2)
+    maps = distance_maps(masks, boards[0].goals)
+    steps = []
+    for board_maps, board in zip(maps, boards):
+        (x1, y1), (x2, y2) = board.pawns
+        steps.append((int(board_maps[0, x1, y1]), int(board_maps[1, x2, y2])))
+    return steps
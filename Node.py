@@ -5,23 +5,31 @@
 
 from __future__ import annotations
 
-from math import log, sqrt
-from typing import List, Tuple
+from array import array
 
 from CustomBoard import CustomBoard
+from quoridor import NB_PAWN_ACTIONS
 
+# Bits of Node.child_flags
+FOLLOWING_SHORTEST_PATH = 1
+PAWN_MOVE = 2
 
 
 class Node:
 
-    def __init__(self, player: int = 0, action: Tuple[str, int, int] = None,
+    __slots__ = ('player', 'action', 'following_shortest_path', 'board',
+                 '_U', '_N', 'slot', 'children', 'child_U', 'child_N',
+                 'child_flags', 'parent', 'pending_walls',
+                 'nb_admitted_walls', 'depth', 'twins')
+
+    def __init__(self, player: int = 0, action: int = None,
                  following_shortest_path: bool = False,
                  board: CustomBoard = None, U: int = 0, N: int = 0):
         """Node constructor
 
         Args:
             player (int, optional): The player. Defaults to 0.
-            action (Tuple[str, int, int], optional): The action done at the node. Defaults to None.
+            action (int, optional): The code of the action done at the node, see quoridor.ACTIONS. Defaults to None.
             following_shortest_path (bool, optional): A boolean indicating whether the action is folling the shortest path or not. Defaults to False.
             board (CustomBoard, optional): The new board after the action is done. Defaults to None.
             U (int, optional): Number of win following the node. Defaults to 0.
@@ -32,11 +40,25 @@ class Node:
         self.action = action
         self.following_shortest_path = following_shortest_path
         self.board = board
-        self.U = U
-        self.N = N
-        self.children: List[Node]
+        # U and N of a node with a parent are kept in the columns of the
+        # parent, at index slot, see the U and N properties
+        self._U = U
+        self._N = N
+        self.slot = 0
         self.children = []
+        # U, N and flags of the children, created with the first child
+        self.child_U = None
+        self.child_N = None
+        self.child_flags = None
         self.parent = None
+        # Walls not yet added as children in progressive widening
+        self.pending_walls = None
+        self.nb_admitted_walls = 0
+        # Distance from the root of the tree
+        self.depth = 0
+        # Nodes of the same position sharing U and N through a
+        # transposition table, None if the node is not shared
+        self.twins = None
 
     def addChild(self, child: Node):
         """Add a child to the current node node
@@ -45,18 +67,66 @@ class Node:
            child (Node): The child to add
         """
         child.parent = self
+        child.depth = self.depth + 1
+        child.slot = len(self.children)
+        if child.slot == 0:
+            self.child_U = array('q')
+            self.child_N = array('q')
+            self.child_flags = array('b')
         self.children.append(child)
+        self.child_U.append(child._U)
+        self.child_N.append(child._N)
+        flags = 0
+        if child.following_shortest_path:
+            flags |= FOLLOWING_SHORTEST_PATH
+        if child.action is not None and child.action < NB_PAWN_ACTIONS:
+            flags |= PAWN_MOVE
+        self.child_flags.append(flags)
 
-    def get_uct_value(self) -> float:
-        """Returns and calculates UCT value of current node
+    def removeChild(self, child: Node):
+        """Remove a child of the current node
 
-        Returns:
-           float: Calculated UCT value of the node
+        Args:
+           child (Node): The child to remove
         """
-        N = self.N
-        if N == 0:
-            return float('inf')
+        slot = child.slot
+        child.detach()
+        del self.children[slot]
+        del self.child_U[slot]
+        del self.child_N[slot]
+        del self.child_flags[slot]
+        for next_child in self.children[slot:]:
+            next_child.slot -= 1
+
+    def detach(self):
+        """Take U and N out of the columns of the parent, which is
+        forgotten"""
+        self._U = self.U
+        self._N = self.N
+        self.parent = None
+
+    @property
+    def U(self) -> int:
+        if self.parent is None:
+            return self._U
+        return self.parent.child_U[self.slot]
+
+    @U.setter
+    def U(self, value: int):
+        if self.parent is None:
+            self._U = value
+        else:
+            self.parent.child_U[self.slot] = value
+
+    @property
+    def N(self) -> int:
+        if self.parent is None:
+            return self._N
+        return self.parent.child_N[self.slot]
+
+    @N.setter
+    def N(self, value: int):
+        if self.parent is None:
+            self._N = value
         else:
-            N_parent = self.parent.N
-            U = self.U
-            return (U / N) + sqrt(2) * sqrt(log(N_parent) / N)
\ No newline at end of file
+            self.parent.child_N[self.slot] = value
@@ -0,0 +1,179 @@
+# ####################################################################
+# # 		* Simon, Sanmar (1938126)
+# # 		* Harti, Ghali (1953494)
+# ####################################################################
+
+from array import array
+from collections import deque
+
+NO_PARENT = -1
+NO_ACTION = -1
+
+# Bits of NodeStore.flags
+FOLLOWING_SHORTEST_PATH = 1
+
+
+class NodeStore:
+    """
+    Nodes of a MCTS tree stored as columns of arrays indexed by node.
+    The children of a node are consecutive: they are added all at once,
+    from first_child[node] to first_child[node] + nb_children[node].
+    Actions are integer codes, see quoridor.ACTIONS.
+    """
+
+    def __init__(self, capacity: int = 4096):
+        """
+        Args:
+            capacity (int): Number of nodes allocated, doubled when full
+        """
+        self.size = 0
+        self.capacity = capacity
+        self.U = array('q', [0]) * capacity
+        self.N = array('q', [0]) * capacity
+        self.action = array('h', [NO_ACTION]) * capacity
+        self.player = array('b', [0]) * capacity
+        self.flags = array('b', [0]) * capacity
+        self.parent = array('l', [NO_PARENT]) * capacity
+        self.first_child = array('l', [0]) * capacity
+        self.nb_children = array('h', [0]) * capacity
+
+    def grow(self):
+        """Doubles the capacity of the columns"""
+        self.U.extend(array('q', [0]) * self.capacity)
+        self.N.extend(array('q', [0]) * self.capacity)
+        self.action.extend(array('h', [NO_ACTION]) * self.capacity)
+        self.player.extend(array('b', [0]) * self.capacity)
+        self.flags.extend(array('b', [0]) * self.capacity)
+        self.parent.extend(array('l', [NO_PARENT]) * self.capacity)
+        self.first_child.extend(array('l', [0]) * self.capacity)
+        self.nb_children.extend(array('h', [0]) * self.capacity)
+        self.capacity *= 2
+
+    def append(self, parent: int, action: int, player: int, flags: int = 0,
+               U: int = 0, N: int = 0) -> int:
+        """Adds a node without children and returns its index"""
+        if self.size == self.capacity:
+            self.grow()
+        index = self.size
+        self.size += 1
+        self.U[index] = U
+        self.N[index] = N
+        self.action[index] = action
+        self.player[index] = player
+        self.flags[index] = flags
+        self.parent[index] = parent
+        return index
+
+    def add_children(self, parent: int, player: int, actions, flags) -> int:
+        """
+        Adds the children of a node without children
+
+        Args:
+            parent (int): The node
+            player (int): The player doing the actions
+            actions: Action codes of the children
+            flags: Flags of the children
+
+        Returns:
+            int: Index of the first child
+        """
+        first = self.size
+        self.first_child[parent] = first
+        self.nb_children[parent] = len(actions)
+        for action, action_flags in zip(actions, flags):
+            self.append(parent, action, player, action_flags)
+        return first
+
+    def children(self, index: int) -> range:
+        """Returns the indices of the children of a node"""
+        first = self.first_child[index]
+        return range(first, first + self.nb_children[index])
+
+    def copy_subtree(self, index: int):
+        """
+        Returns a new store holding the subtree of a node, the node being
+        the index 0 of the new store
+        """
+        store = NodeStore(max(4096, self.capacity // 2))
+        store.append(NO_PARENT, self.action[index], self.player[index],
+                     self.flags[index], self.U[index], self.N[index])
+        queue = deque([(index, 0)])
+        while queue:
+            old, new = queue.popleft()
+            if self.nb_children[old] == 0:
+                continue
+            store.first_child[new] = store.size
+            store.nb_children[new] = self.nb_children[old]
+            for child in self.children(old):
+                queue.append((child, store.append(
+                    new, self.action[child], self.player[child],
+                    self.flags[child], self.U[child], self.N[child])))
+        return store
+
+
+class NodeView:
+    """
+    Node of a CompactTree, with the attributes of Node read from and
+    written to the NodeStore of the tree
+    """
+
+    __slots__ = ('tree', 'index')
+
+    def __init__(self, tree, index: int):
+        self.tree = tree
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, NodeView) and self.tree is other.tree \
+            and self.index == other.index
+
+    def __hash__(self):
+        return self.index
+
+    @property
+    def U(self):
+        return self.tree.store.U[self.index]
+
+    @U.setter
+    def U(self, value):
+        self.tree.store.U[self.index] = value
+
+    @property
+    def N(self):
+        return self.tree.store.N[self.index]
+
+    @N.setter
+    def N(self, value):
+        self.tree.store.N[self.index] = value
+
+    @property
+    def player(self):
+        return self.tree.store.player[self.index]
+
+    @property
+    def action(self):
+        code = self.tree.store.action[self.index]
+        return None if code == NO_ACTION else code
+
+    @property
+    def following_shortest_path(self):
+        return bool(self.tree.store.flags[self.index] &
+                    FOLLOWING_SHORTEST_PATH)
+
+    @property
+    def parent(self):
+        parent = self.tree.store.parent[self.index]
+        return None if parent == NO_PARENT else NodeView(self.tree, parent)
+
+    @property
+    def children(self):
+        return [NodeView(self.tree, child)
+                for child in self.tree.store.children(self.index)]
+
+    @property
+    def board(self):
+        return self.tree.board_of(self.index)
+
+    @property
+    def twins(self):
+        return None
@@ -0,0 +1,101 @@
+####################################################################
+# 		* Simon, Sanmar (1938126)
+# 		* Harti, Ghali (1953494)
+####################################################################
+
+import random
+from typing import Optional, Tuple
+
+from CustomBoard import CustomBoard
+from quoridor import PLAYER1, PLAYER2, NoPath, encode_action
+
+
+class StaticEvaluation:
+    """
+    Simulation of Tree.simulate which plays no move: the leaf is scored by
+    the shortest paths of both players on its board
+    """
+
+    def steps(self, board: CustomBoard, player: int) -> Tuple[int, int]:
+        """
+        Args:
+            board (CustomBoard): The board of the leaf, left unchanged
+            player (int): The player to move on board
+
+        Returns:
+            Tuple[int, int]: The minimum steps before victory of both players
+        """
+        return (board.min_steps_before_victory_safe(PLAYER1),
+                board.min_steps_before_victory_safe(PLAYER2))
+
+
+class LightRollout(StaticEvaluation):
+    """
+    Simulation of Tree.simulate playing a light-policy playout from the leaf.
+    Like GreedyAgent, the player to move places a wall in front of its
+    opponent with probability wall_probability, and otherwise follows its
+    shortest path. After depth plies, or at the end of the game, the board
+    reached is scored like StaticEvaluation. The playout is played on the
+    board of the leaf with do_action, then undone.
+    """
+
+    def __init__(self, depth: int = 20, wall_probability: float = 0.25):
+        """
+        Args:
+            depth (int): Maximum number of plies played
+            wall_probability (float): Probability of trying to place a wall
+                when the player has walls left
+        """
+        self.depth = depth
+        self.wall_probability = wall_probability
+
+    def steps(self, board: CustomBoard, player: int) -> Tuple[int, int]:
+        """
+        Args:
+            board (CustomBoard): The board of the leaf, left unchanged
+            player (int): The player to move on board
+
+        Returns:
+            Tuple[int, int]: The minimum steps before victory of both players
+                on the board ending the playout
+        """
+        tokens = []
+        try:
+            for _ in range(self.depth):
+                if board.is_finished():
+                    break
+                wall = None
+                if board.nb_walls[player] > 0 and \
+                        random.random() < self.wall_probability:
+                    wall = self.wall_in_front(board, player)
+                if wall is None:
+                    try:
+                        (x, y) = board.get_shortest_path(player)[0]
+                        action = ('P', x, y)
+                    except NoPath:
+                        # The opponent pawn closes the only corridor
+                        moves = board.get_legal_pawn_moves(player)
+                        if not moves:
+                            break
+                        action = random.choice(moves)
+                else:
+                    action = wall
+                tokens.append(board.do_action(encode_action(action), player))
+                player = 1 - player
+            return super().steps(board, player)
+        finally:
+            for token in reversed(tokens):
+                board.undo(token)
+
+    @staticmethod
+    def wall_in_front(board: CustomBoard,
+                      player: int) -> Optional[Tuple[str, int, int]]:
+        """
+        Returns a random legal horizontal wall placed by player just in front
+        of its opponent, or None if there is none
+        """
+        (x, y) = board.pawns[1 - player]
+        row = x - 1 if board.goals[1 - player] < x else x
+        walls = [('WH', row, column) for column in (y - 1, y)
+                 if board.is_wall_possible_here((row, column), True)]
+        return random.choice(walls) if walls else None
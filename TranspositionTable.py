@@ -0,0 +1,62 @@
+# ####################################################################
+# # 		* Simon, Sanmar (1938126)
+# # 		* Harti, Ghali (1953494)
+# ####################################################################
+
+from collections import OrderedDict
+
+
+class TranspositionTable:
+    """
+    Bounded table of the MCTS nodes by position.
+    Entries are keyed by (Zobrist hash, depth): a position repeated along a
+    line (a pawn going back and forth) gives different entries, so the
+    nodes sharing statistics are never on the same path.
+    When the table is full, the deepest of the least recently used entries
+    is replaced.
+    """
+
+    EVICTION_SAMPLE = 8
+
+    def __init__(self, max_entries: int):
+        """
+        Args:
+            max_entries (int): Maximum number of positions kept
+        """
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        # A found entry only saves the clone of a board: the twin still
+        # gets its own children when it is expanded
+        self.boards_shared = 0
+        self.boards_built = 0
+
+    def get(self, key):
+        """Returns the node stored for key or None"""
+        node = self.entries.get(key)
+        if node is None:
+            self.boards_built += 1
+        else:
+            self.boards_shared += 1
+            self.entries.move_to_end(key)
+        return node
+
+    def put(self, key, node):
+        """Stores node for key, replacing an old entry if the table is
+        full"""
+        if len(self.entries) >= self.max_entries:
+            oldest = []
+            for old_key in self.entries:
+                oldest.append(old_key)
+                if len(oldest) == self.EVICTION_SAMPLE:
+                    break
+            del self.entries[max(oldest, key=lambda k: k[1])]
+        self.entries[key] = node
+
+    def drop_shallower(self, depth):
+        """Removes the entries above depth, which can no longer be reached"""
+        for key in [key for key in self.entries if key[1] < depth]:
+            del self.entries[key]
+
+    def reset_counters(self):
+        self.boards_shared = 0
+        self.boards_built = 0
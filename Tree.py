@@ -4,49 +4,179 @@
 ####################################################################
 
 import random
+import threading
+from array import array
+from math import log, sqrt
 from typing import List, Set, Tuple
 
+import numpy as np
+
 from CustomBoard import CustomBoard
-from Node import Node
-from quoridor import NoPath
+from DistanceMaps import UNREACHABLE, distance_maps, stack_wall_masks
+from Node import FOLLOWING_SHORTEST_PATH, PAWN_MOVE, Node
+from quoridor import (ACTION_EDGES, ACTION_KINDS, ACTION_POSITIONS,
+                      CELL_NEIGHBOURHOODS, KIND_WH, NB_PAWN_ACTIONS, PLAYER1,
+                      PLAYER2, WALL_NEIGHBOURHOODS, NoPath, mask_bits,
+                      shortest_path_edges, wall_index)
+from Rollout import StaticEvaluation
+from TranspositionTable import TranspositionTable
+
+
+def evaluate_boards(boards) -> List[Tuple[int, int]]:
+    """
+    Evaluator of Tree.batch_iteration scoring the boards like StaticEvaluation
+
+    Returns:
+        List[Tuple[int, int]]: The minimum steps before victory of both
+            players on each board
+    """
+    return [(board.min_steps_before_victory_safe(PLAYER1),
+             board.min_steps_before_victory_safe(PLAYER2))
+            for board in boards]
+
+
+# Below this number of children, the UCT values are computed in a loop,
+# faster than the NumPy calls
+MIN_VECTORIZED_CHILDREN = 16
+
+
+def max_uct_slots(U: array, N: array, N_parent: int) -> List[int]:
+    """
+    Compute the UCT values of the children of a node in one pass
+
+    Args:
+        U (array): U of the children, as an array of 'q'
+        N (array): N of the children, as an array of 'q'
+        N_parent (int): N of the node
+
+    Returns:
+        List[int]: The indices of the children with the highest UCT value
+    """
+    if len(N) < MIN_VECTORIZED_CHILDREN:
+        log_N_parent = log(N_parent)
+        all_ucts = [(u / n) + sqrt(2) * sqrt(log_N_parent / n) if n else float('inf')
+                    for u, n in zip(U, N)]
+        max_uct = max(all_ucts)
+        return [i for i, uct in enumerate(all_ucts) if uct == max_uct]
+
+    U = np.frombuffer(U, dtype=np.int64)
+    N = np.frombuffer(N, dtype=np.int64)
+    # The UCT value of an unvisited child is infinite
+    unvisited = np.flatnonzero(N == 0)
+    if len(unvisited):
+        return unvisited.tolist()
+    all_ucts = (U / N) + sqrt(2) * np.sqrt(log(N_parent) / N)
+    return np.flatnonzero(all_ucts == all_ucts.max()).tolist()
 
 
 class Tree:
-    """Tree representing a MCTS tree"""
-    def __init__(self, player: int = 0, initial_board: CustomBoard = None):
+    """
+    Tree representing a MCTS tree.
+    Each node built keeps its own board, a clone of the board of its parent
+    (see set_child_board): the search does not walk one board with
+    do_action and undo.
+    """
+
+    # Simulations counted as lost on a path while its leaf is simulated by
+    # a thread, so that the other threads select other paths
+    VIRTUAL_LOSS = 1
+
+    # In progressive widening, a node with N simulations has at most
+    # WIDENING_C * N ** WIDENING_ALPHA wall children
+    WIDENING_C = 1.0
+    WIDENING_ALPHA = 0.5
+
+    def __init__(self, player: int = 0, initial_board: CustomBoard = None,
+                 transposition_size: int = 0, lazy_expansion: bool = True,
+                 progressive_widening: bool = False, rollout=None):
         """
         Tree constructor
         Args:
             player (int): The player
             initial_board (CustomBoard): The initial board
+            transposition_size (int): Maximum number of positions in the
+                transposition table, 0 for no table
+            lazy_expansion (bool): Build the board of a child, and check the
+                legality of its wall, only when it is first selected
+            progressive_widening (bool): Add the wall children of a node
+                progressively, as its number of simulations grows
+            rollout: Simulation of the leaves (StaticEvaluation or
+                LightRollout), StaticEvaluation by default
         """
         opponent = 1 - player
         self.root = Node(player=opponent, board=initial_board, action=None,
                              U=0, N=0)
+        self.transpositions = None
+        if transposition_size > 0:
+            self.transpositions = TranspositionTable(transposition_size)
+        # Taken by parallel_iteration to select, expand and back propagate
+        self.lock = threading.Lock()
+        self.lazy_expansion = lazy_expansion
+        self.progressive_widening = progressive_widening
+        self.rollout = rollout or StaticEvaluation()
+        # Work left undone by the lazy expansions so far
+        self.nb_avoided_clones = 0
+        self.nb_avoided_wall_checks = 0
+
+    def advance_root(self, board: CustomBoard) -> bool:
+        """
+        Move the root two plies down, to the grandchild having the position
+        of board, so that the next search continues from its statistics.
+        Node depths are kept, the transposition table stays valid.
+
+        Args:
+            board (CustomBoard): The board received for the new move
 
-    def getInterestingNode(self) -> Node:
+        Returns:
+            bool: True if the position was found in the tree
+        """
+        for child in self.root.children:
+            for grandchild in child.children:
+                if grandchild.board is None:
+                    zobrist = child.board.zobrist_after(grandchild.action,
+                                                        grandchild.player)
+                else:
+                    zobrist = grandchild.board.zobrist
+                if zobrist == board.zobrist and \
+                        self.materialize(grandchild) and \
+                        tuple(grandchild.board.pawns) == tuple(board.pawns):
+                    grandchild.detach()
+                    self.root = grandchild
+                    if self.transpositions is not None:
+                        self.transpositions.drop_shallower(grandchild.depth)
+                    return True
+        return False
+
+    def getInterestingNode(self, start: Node = None) -> Node:
         """
         If there are multiple nodes giving the highest UCT,
         the node going into the direction of the shortest path is prioritized
+        Args:
+            start (Node): The node where the selection starts, the root by
+                default
         Returns:
             Node: The best Node
         """
-        node = self.root
+        node = self.root if start is None else start
 
         while len(node.children) != 0 and node.N > 0:
-            all_ucts = list(map(lambda child: child.get_uct_value(), node.children))
-            max_uct = max(all_ucts)
-            nodes_max_uct = [node.children[i] for i in range(len(node.children)) if all_ucts[i] == max_uct]
-
-            pawns_nodes_max_uct, walls_nodes_max_uct = self.separate_pawns_walls_nodes(nodes_max_uct)
-            nodes_max_uct_after_shortest_path = [n for n in pawns_nodes_max_uct if n.following_shortest_path]
-
-            if len(nodes_max_uct_after_shortest_path) > 0:
-                node = random.choice(nodes_max_uct_after_shortest_path)
-            elif len(pawns_nodes_max_uct):
-                node = random.choice(pawns_nodes_max_uct)
+            if node.pending_walls:
+                self.widen(node)
+            slots_max_uct = max_uct_slots(node.child_U, node.child_N, node.N)
+
+            flags = node.child_flags
+            slots_max_uct_after_shortest_path = [i for i in slots_max_uct if flags[i] & FOLLOWING_SHORTEST_PATH]
+            pawns_slots_max_uct = [i for i in slots_max_uct if flags[i] & PAWN_MOVE]
+
+            if len(slots_max_uct_after_shortest_path) > 0:
+                child = node.children[random.choice(slots_max_uct_after_shortest_path)]
+            elif len(pawns_slots_max_uct):
+                child = node.children[random.choice(pawns_slots_max_uct)]
             else:
-                node = random.choice(walls_nodes_max_uct)
+                child = node.children[random.choice(slots_max_uct)]
+
+            if self.materialize(child):
+                node = child
 
         return node
 
@@ -70,6 +200,123 @@ class Tree:
 
         player, opponent = self.getPlayersFromNode(node.player)
 
+        child_actions = self.get_child_actions(current_board, player, not self.lazy_expansion)
+        if self.progressive_widening:
+            node.pending_walls = [action for action, _ in child_actions if action >= NB_PAWN_ACTIONS]
+            child_actions = [(action, following_shortest_path) for action, following_shortest_path in child_actions
+                             if action < NB_PAWN_ACTIONS]
+        for action, following_shortest_path in child_actions:
+            self.add_child(node, action, player, following_shortest_path)
+
+        return random.choice(node.children)
+
+    def add_child(self, node: Node, action: int, player: int,
+                  following_shortest_path: bool = False):
+        """
+        Add the child of a node for an action code, with its board unless the
+        expansion is lazy
+        """
+        child = Node(player=player, action=action, following_shortest_path=following_shortest_path)
+        node.addChild(child)
+        if self.lazy_expansion:
+            self.nb_avoided_clones += 1
+            if action >= NB_PAWN_ACTIONS:
+                self.nb_avoided_wall_checks += 1
+        else:
+            self.set_child_board(child)
+
+    def widen(self, node: Node):
+        """
+        Add the next pending walls of a node as children, up to
+        WIDENING_C * N ** WIDENING_ALPHA walls. The pending walls are sorted
+        by priority when the first one is added.
+
+        Args:
+            node (Node): A node expanded in progressive widening
+        """
+        nb_allowed_walls = int(self.WIDENING_C * node.N ** self.WIDENING_ALPHA)
+        if node.nb_admitted_walls >= nb_allowed_walls:
+            return
+        player = 1 - node.player
+        if node.nb_admitted_walls == 0:
+            node.pending_walls = self.sort_walls_by_priority(node.board, node.pending_walls, player)
+        while node.nb_admitted_walls < nb_allowed_walls and node.pending_walls:
+            node.nb_admitted_walls += 1
+            self.add_child(node, node.pending_walls.pop(), player)
+
+    @staticmethod
+    def sort_walls_by_priority(board: CustomBoard, walls: List[int], player: int) -> List[int]:
+        """
+        Sort walls by how much they lengthen the shortest path of the
+        opponent of player. A wall that does not cut the current shortest
+        path does not lengthen it, the other ones are evaluated in one call.
+
+        Args:
+            board (CustomBoard): The board where player places the walls
+            walls (List[int]): The codes of the wall actions
+            player (int): The player placing the walls
+
+        Returns:
+            List[int]: The walls, the best one last
+        """
+        opponent = 1 - player
+        try:
+            opponent_path_edges = shortest_path_edges(board, opponent)
+        except NoPath:
+            return walls
+        cutting_walls = [wall for wall in walls
+                         if any(edge in opponent_path_edges for edge in ACTION_EDGES[wall])]
+
+        steps = Tree.evaluate_actions(board, cutting_walls, player)[:, opponent]
+        gains = np.where(steps[1:] == UNREACHABLE, -1, steps[1:] - steps[0])
+        priorities = dict(zip(cutting_walls, gains.tolist()))
+        return sorted(walls, key=lambda wall: priorities.get(wall, 0))
+
+    @staticmethod
+    def evaluate_actions(board: CustomBoard, actions: List[int], player: int) -> np.ndarray:
+        """
+        Compute the minimum steps before victory of both players after each
+        action of player, from the distance maps of all the boards reached
+        computed in one call. The boards are not built, and the pawns do not
+        block each other (see DistanceMaps).
+
+        Args:
+            board (CustomBoard): The board where player does the actions
+            actions (List[int]): The action codes, for example those of all
+                the children of an expanded node
+            player (int): The player doing the actions
+
+        Returns:
+            np.ndarray: The (len(actions) + 1, 2) steps of both players,
+                first on board then after each action, UNREACHABLE if there
+                is no path
+        """
+        maps = distance_maps(stack_wall_masks(board, actions), board.goals)
+        rows = np.empty((len(actions) + 1, 2), dtype=np.intp)
+        columns = np.empty((len(actions) + 1, 2), dtype=np.intp)
+        rows[:], columns[:] = zip(*board.pawns)
+        for i, action in enumerate(actions, 1):
+            if action < NB_PAWN_ACTIONS:
+                rows[i, player], columns[i, player] = ACTION_POSITIONS[action]
+        return maps[np.arange(len(maps))[:, None], (PLAYER1, PLAYER2), rows, columns]
+
+    def get_child_actions(self, current_board: CustomBoard, player: int, check_walls: bool = True) -> List[Tuple[int, bool]]:
+        """
+        Get the actions of the children added by an expansion: the legal pawn
+        moves and the legal interesting walls, or only the move along the
+        shortest path once player has no wall left
+
+        Args:
+            current_board (CustomBoard): The board of the expanded node
+            player (int): The player doing the actions
+            check_walls (bool): Whether the walls must keep a path for both
+                players, otherwise they are only checked to be on a free slot
+
+        Returns:
+            List[Tuple[int, bool]]: The action codes, each with whether it
+                follows the shortest path of player
+        """
+        opponent = 1 - player
         player_shortest_path = None
 
         try:
@@ -79,129 +326,230 @@ class Tree:
             has_shortest_path = False
 
         if current_board.nb_walls[player] == 0 and has_shortest_path:
-            action = 'P', player_shortest_path[0][0], player_shortest_path[0][1]
-            new_board = current_board.clone()
-            new_board.play_action_with_no_check(action, player)
-            new_node = Node(player=player, action=action, following_shortest_path=True, board=new_board)
-            node.addChild(new_node)
-            return new_node
-
-        for action in current_board.get_legal_pawn_moves(player):
-            new_board = current_board.clone()
-            new_board.play_action_with_no_check(action, player)
-            following_shortest_path = has_shortest_path and (
-                player_shortest_path[0][0], player_shortest_path[0][1]) == (
-                                          action[1], action[2])
-            node.addChild(Node(player=player, action=action, following_shortest_path=following_shortest_path, board=new_board))
+            (x, y) = player_shortest_path[0]
+            return [(x * 9 + y, True)]
+
+        child_actions = []
+        for _, x, y in current_board.get_legal_pawn_moves(player):
+            following_shortest_path = has_shortest_path and \
+                tuple(player_shortest_path[0]) == (x, y)
+            child_actions.append((x * 9 + y, following_shortest_path))
 
         all_walls = self.getInterestingWalls(current_board, current_board.pawns[opponent])
-        for is_horizontal_wall, wall_y, wall_x in all_walls:
-            if not current_board.is_wall_possible_here((wall_y, wall_x),is_horizontal_wall):
+        wall_check = current_board.is_wall_possible_here if check_walls else current_board.is_wall_slot_free
+        for slot in mask_bits(all_walls):
+            action = NB_PAWN_ACTIONS + slot
+            if not wall_check(ACTION_POSITIONS[action], ACTION_KINDS[action] == KIND_WH):
                 continue
-            new_board = current_board.clone()
-            new_board.add_wall_with_no_check((wall_y, wall_x), is_horizontal_wall, player)
-            action = 'WH' if is_horizontal_wall else 'WV', wall_y, wall_x
-            new_board.play_action_with_no_check(action, player)
-            node.addChild(
-                Node(player=player, action=action, board=new_board))
+            child_actions.append((action, False))
 
-        return random.choice(node.children)
+        return child_actions
+
+    def materialize(self, node: Node) -> bool:
+        """
+        Build the board of a child added by a lazy expansion, after checking
+        that its wall keeps a path for both players. A child with an illegal
+        wall is removed from its parent.
 
-    def simulate(self, node: Node):
+        Args:
+            node (Node): The child
+
+        Returns:
+            bool: False if the child was removed
         """
-        Simulate the node by checking if a node is better than another one by comparing
-        the length of the players shortest path to victory and the length
-        of his opponent shortest path to victory
+        if node.board is not None:
+            return True
+        action = node.action
+        if action >= NB_PAWN_ACTIONS:
+            self.nb_avoided_wall_checks -= 1
+            if not node.parent.board.is_wall_possible_here(ACTION_POSITIONS[action], ACTION_KINDS[action] == KIND_WH):
+                node.parent.removeChild(node)
+                return False
+        self.nb_avoided_clones -= 1
+        self.set_child_board(node)
+        return True
+
+    def set_child_board(self, child: Node):
+        """
+        Give a child the board of its parent after its action. If the
+        transposition table already has a node for the new position at that
+        depth, the child reuses its board and shares its U and N instead of
+        playing the action on a new board.
+
+        Args:
+            child (Node): The child, added to its parent
+        """
+        node = child.parent
+        if self.transpositions is None:
+            child.board = node.board.clone()
+            child.board.play_code_with_no_check(child.action, child.player)
+            return
+
+        key = (node.board.zobrist_after(child.action, child.player), child.depth)
+        twin = self.transpositions.get(key)
+        if twin is None:
+            child.board = node.board.clone()
+            child.board.play_code_with_no_check(child.action, child.player)
+            self.transpositions.put(key, child)
+            return
+
+        child.board = twin.board
+        child.U = twin.U
+        child.N = twin.N
+        if twin.twins is None:
+            twin.twins = [twin]
+        twin.twins.append(child)
+        child.twins = twin.twins
+
+    def simulate(self, node: Node, board: CustomBoard = None):
+        """
+        Simulate the node with the rollout of the tree, then check if the
+        initial player is better than its opponent by comparing the length
+        of their shortest paths to victory
 
         Args:
             node (Node): The node to simulate
+            board (CustomBoard): A private clone of the board of node to
+                simulate instead, see parallel_iteration
 
         Returns:
             int: 1 if player won and 0 if player lost
 
         """
-        board = node.board
-        player, opponent = self.getPlayersFromNode(node.player)
-
-        player_shortest_path = board.min_steps_before_victory_safe(
-            player=player)
-        opponent_shortest_path = board.min_steps_before_victory_safe(
-            player=opponent)
+        player, _ = self.getPlayersFromNode(node.player)
+        if board is None:
+            board = node.board
+        steps = self.rollout.steps(board, player)
 
         initial_player = 1 - self.root.player
-        if initial_player == player:
-            return int(player_shortest_path <= opponent_shortest_path)
-        else:
-            return int(opponent_shortest_path <= player_shortest_path)
+        return int(steps[initial_player] <= steps[1 - initial_player])
 
-    def backPropagate(self, node: Node, simulation_result: int):
+    def backPropagate(self, node: Node, simulation_result: int,
+                      virtual_loss: int = 0):
         """
         Propagate the scores from the leaf to the root
 
         Args:
             node (Node): The node from which to propagate the simulation result
             simulation_result (int): 1 if player won and 0 if player lost
+            virtual_loss (int): Virtual loss added on the path by
+                add_virtual_loss, removed here
         """
 
         while node:
-            node.U += simulation_result
-            node.N += 1
+            if node.twins is None:
+                node.U += simulation_result
+                node.N += 1
+            else:
+                for twin in node.twins:
+                    twin.U += simulation_result
+                    twin.N += 1
+            node.N -= virtual_loss
             node = node.parent
 
+    def add_virtual_loss(self, node: Node):
+        """
+        Count VIRTUAL_LOSS lost simulations on the path from the root to
+        node, until its result is back propagated
+
+        Args:
+            node (Node): The selected leaf
+        """
+        while node:
+            node.N += self.VIRTUAL_LOSS
+            node = node.parent
+
+    def parallel_iteration(self):
+        """
+        Run one MCTS iteration, safe to call from several threads searching
+        the same tree. Selection, expansion and back propagation hold the
+        tree lock; the simulation runs without it, with a virtual loss on
+        its path, on a clone of the board of the leaf.
+        """
+        with self.lock:
+            node = self.getInterestingNode()
+            self.add_virtual_loss(node)
+            if not node.children:
+                self.expand(node)
+            board = node.board.clone()
+
+        simulation_result = self.simulate(node, board)
+
+        with self.lock:
+            self.backPropagate(node, simulation_result, self.VIRTUAL_LOSS)
+
+    def batch_iteration(self, batch_size: int, evaluator=None):
+        """
+        Run batch_size MCTS iterations: select and expand batch_size leaves,
+        with a virtual loss on their paths so that they differ, evaluate
+        their boards in one evaluator call, then back propagate all the
+        results
+
+        Args:
+            batch_size (int): Number of leaves of the batch
+            evaluator: Function returning the minimum steps before victory
+                of both players for a list of boards, see evaluate_boards.
+                By default, each leaf is simulated with the rollout of the
+                tree
+        """
+        leaves = []
+        for _ in range(batch_size):
+            node = self.getInterestingNode()
+            self.add_virtual_loss(node)
+            if not node.children:
+                self.expand(node)
+            leaves.append(node)
+
+        if evaluator is None:
+            all_steps = [self.rollout.steps(node.board, 1 - node.player)
+                         for node in leaves]
+        else:
+            all_steps = evaluator([node.board for node in leaves])
+
+        initial_player = 1 - self.root.player
+        for node, steps in zip(leaves, all_steps):
+            simulation_result = int(
+                steps[initial_player] <= steps[1 - initial_player])
+            self.backPropagate(node, simulation_result, self.VIRTUAL_LOSS)
+
     def getInterestingWalls(self, current_board, opponent_pos):
         """
         Get interesting wall by finding all the walls adjacent to other walls
+        or to the opponent pawn, from the tables of quoridor
         Args:
             current_board (CustomBoard): The board from which to retrieve the walls
 
         Returns:
-            Set[Tuple[bool, int, int]]: The list of walls
+            int: The mask of the walls, indexed by quoridor.wall_index
         """
-        # Set of walls of interest to return
-        interesting_walls = set()
+        # Adding all the walls that are close to the opponent pawn
+        opponent_y, opponent_x = opponent_pos
+        interesting_walls = CELL_NEIGHBOURHOODS[opponent_y * 9 + opponent_x]
 
-        # Adding all the walls that are close to pawns
+        # Adding all the walls that are close to game walls
         for wall_y, wall_x in current_board.horiz_walls:
-            interesting_walls.add((True, wall_y, wall_x - 2))
-            interesting_walls.add((True, wall_y, wall_x + 2))
-            for y in range(-1, 2):
-                for x in range(-1, 2):
-                    interesting_walls.add((False, wall_y - y, wall_x - x))
-
+            interesting_walls |= WALL_NEIGHBOURHOODS[wall_index((wall_y, wall_x), True)]
         for wall_y, wall_x in current_board.verti_walls:
-            interesting_walls.add((False, wall_y + 2, wall_x))
-            interesting_walls.add((False, wall_y - 2, wall_x))
-            for y in range(-1, 2):
-                for x in range(-1, 2):
-                    interesting_walls.add((True, wall_y - y, wall_x - x))
-
-        # Adding all the walls that are close to game walls
-        opponent_y, opponent_x = opponent_pos
-        opponent_y -= 1
-        interesting_walls.add((True, opponent_y, opponent_x - 1))
-        interesting_walls.add((True, opponent_y, opponent_x))
-        interesting_walls.add((True, opponent_y + 1, opponent_x - 1))
-        interesting_walls.add((True, opponent_y + 1, opponent_x))
-        opponent_y += 1
-        opponent_x -= 1
-        interesting_walls.add((False, opponent_y, opponent_x))
-        interesting_walls.add((False, opponent_y, opponent_x + 1))
-        interesting_walls.add((False, opponent_y - 1, opponent_x))
-        interesting_walls.add((False, opponent_y - 1, opponent_x + 1))
+            interesting_walls |= WALL_NEIGHBOURHOODS[wall_index((wall_y, wall_x), False)]
 
         return interesting_walls
 
-    def get_best_child_action(self) -> Tuple[str, int, int]:
+    def get_best_child_action(self) -> int:
         """
         Pick the best action by taking the node that has been simulated the most. If a few nodes
         haves been simulated the same number of time, pick the action that give us the most gains.
         Calculate the gains with the method get_node_gain
 
         Returns:
-            Tuple[str, int, int]: The best action to perform
+            int: The code of the best action to perform, see
+                quoridor.decode_action
         """
         player, opponent = self.getPlayersFromNode(self.root.player)
-        nodes_max_N = [node for node in self.root.children if node.N == max(list(map(lambda child: child.N, self.root.children)))]
+        nodes_max_N = []
+        while len(nodes_max_N) == 0:
+            max_N = max(list(map(lambda child: child.N, self.root.children)))
+            nodes_max_N = [node for node in self.root.children if node.N == max_N]
+            nodes_max_N = [node for node in nodes_max_N if self.materialize(node)]
         gains = list(map(lambda node: self.get_node_gain(node),nodes_max_N))
         nodes_max_gains = [nodes_max_N[i] for i in range(len(nodes_max_N)) if gains[i] == max(gains)]
 
@@ -248,7 +596,7 @@ class Tree:
         pawns_nodes = []
         walls_nodes = []
         for node in nodes:
-            if node.action[0] == 'P':
+            if node.action < NB_PAWN_ACTIONS:
                 pawns_nodes.append(node)
             else:
                 walls_nodes.append(node)
@@ -267,7 +615,7 @@ class Tree:
 
         """
         player, opponent = self.getPlayersFromNode(self.root.player)
-        if node.action[0] == "P":
+        if node.action < NB_PAWN_ACTIONS:
             return self.root.board.min_steps_before_victory_safe(player) - node.board.min_steps_before_victory_safe(player)
         else:
             opponentGain = node.board.min_steps_before_victory_safe(opponent) - self.root.board.min_steps_before_victory_safe(opponent)
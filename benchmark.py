@@ -0,0 +1,94 @@
+####################################################################
+# 		* Simon, Sanmar (1938126)
+# 		* Harti, Ghali (1953494)
+####################################################################
+"""
+Benchmark of the MCTS search on a few fixed positions.
+
+    python benchmark.py --threads 4 --seconds 5
+"""
+
+import argparse
+import random
+from time import time
+
+from Rollout import LightRollout
+from Tree import Tree
+from my_player import BOARD_ENGINES, run_parallel_search
+
+# LightRollout playouts per second on one core, about the rate of the
+# search iterations with StaticEvaluation: at this rate, simulating the
+# leaves with playouts at most halves the iterations
+ROLLOUTS_PER_SECOND_TARGET = 2000
+
+# Positions searched for player 0, as percepts received by MyAgent.play
+BENCHMARK_POSITIONS = {
+    'opening': {
+        'pawns': [[1, 4], [7, 4]], 'goals': [8, 0],
+        'horiz_walls': [], 'verti_walls': [],
+        'nb_walls': [10, 10]},
+    'middle': {
+        'pawns': [[3, 4], [5, 3]], 'goals': [8, 0],
+        'horiz_walls': [[5, 3], [3, 1], [6, 6]], 'verti_walls': [[2, 4]],
+        'nb_walls': [8, 8]},
+    'walled': {
+        'pawns': [[5, 2], [3, 6]], 'goals': [8, 0],
+        'horiz_walls': [[5, 0], [5, 4], [2, 5], [2, 7], [6, 2]],
+        'verti_walls': [[4, 3], [0, 4], [6, 6], [3, 5]],
+        'nb_walls': [3, 4]},
+}
+
+
+def simulations_per_second(percepts, board_engine, nb_threads, seconds):
+    """Returns the simulations per second of a tree-parallel search of
+    percepts"""
+    tree = Tree(player=0, initial_board=board_engine(percepts))
+    start_time = time()
+    run_parallel_search(tree, nb_threads, 10 ** 9, seconds)
+    return tree.root.N / (time() - start_time)
+
+
+def rollouts_per_second(percepts, board_engine, depth, seconds):
+    """Returns the LightRollout playouts of depth plies per second from
+    percepts"""
+    board = board_engine(percepts)
+    rollout = LightRollout(depth=depth)
+    nb_rollouts = 0
+    start_time = time()
+    while time() - start_time < seconds:
+        rollout.steps(board, 0)
+        nb_rollouts += 1
+    return nb_rollouts / (time() - start_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--engine", choices=sorted(BOARD_ENGINES),
+                        default='custom')
+    parser.add_argument("--threads", type=int, default=4,
+                        help="largest number of threads measured")
+    parser.add_argument("--seconds", type=float, default=5,
+                        help="search time of each measure")
+    parser.add_argument("--rollout-depth", type=int, default=0,
+                        metavar="PLIES",
+                        help="measure the playouts of this depth instead of "
+                             "the search")
+    args = parser.parse_args()
+
+    random.seed(0)
+    if args.rollout_depth > 0:
+        for name, percepts in BENCHMARK_POSITIONS.items():
+            rate = rollouts_per_second(percepts, BOARD_ENGINES[args.engine],
+                                       args.rollout_depth, args.seconds)
+            print(f"{name:8} {rate:8.1f} rollouts/s (target "
+                  f"{ROLLOUTS_PER_SECOND_TARGET}"
+                  f"{', missed' if rate < ROLLOUTS_PER_SECOND_TARGET else ''})")
+        parser.exit()
+    for name, percepts in BENCHMARK_POSITIONS.items():
+        base = None
+        for nb_threads in range(1, args.threads + 1):
+            rate = simulations_per_second(
+                percepts, BOARD_ENGINES[args.engine], nb_threads, args.seconds)
+            base = base or rate
+            print(f"{name:8} {nb_threads} threads: {rate:8.1f} simulations/s "
+                  f"(x{rate / base:.2f})")
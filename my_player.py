@@ -17,11 +17,17 @@ along with this program; if not, see <http://www.gnu.org/licenses/>.
 
 """
 from __future__ import annotations
+import multiprocessing
+import threading
 import traceback
 from time import time
-from Tree import Tree
+from CompactTree import CompactTree
+from Rollout import LightRollout
+from Tree import Tree, evaluate_boards
 
+from BitBoard import BitBoard
 from CustomBoard import CustomBoard
+from DistanceMaps import batch_min_steps
 import heapq
 import random
 from quoridor import *
@@ -31,6 +37,58 @@ from typing import List, Tuple
 class MyAgent(Agent):
     """My Quoridor agent."""
 
+    def __init__(self, board_engine=CustomBoard, transposition_size=0,
+                 reuse_tree=True, ponder_iterations=0, nb_workers=1,
+                 nb_threads=1, batch_size=1, batch_processes=0,
+                 tree_class=Tree, progressive_widening=False, rollout=None,
+                 batch_evaluator=None):
+        """
+        Args:
+            board_engine: Board class used by the search (CustomBoard or
+                BitBoard), built from the percepts at each play
+            transposition_size: Maximum number of positions in the
+                transposition table of the search, 0 for no table
+            reuse_tree: Continue the search tree of the previous play when
+                the new position is one of its grandchildren
+            ponder_iterations: Maximum number of iterations searched below
+                the chosen move while the opponent plays, 0 for no
+                pondering
+            nb_workers: Number of independent searches merged at the root,
+                one in this process and the others in a process pool
+            nb_threads: Number of threads searching the tree of this
+                process
+            batch_size: Number of leaves selected before evaluating them in
+                one call, 1 for no batching
+            batch_processes: Number of processes evaluating the batches, 0
+                to evaluate them in this process
+            tree_class: Tree class of the search (Tree or CompactTree)
+            progressive_widening: Add the wall children of the nodes as
+                their number of simulations grows
+            rollout: Simulation of the leaves (StaticEvaluation or
+                LightRollout), StaticEvaluation if None
+            batch_evaluator: Function evaluating the boards of a batch in
+                one call (see Tree.batch_iteration), None to simulate each
+                leaf with the rollout
+        """
+        self.board_engine = board_engine
+        self.transposition_size = transposition_size
+        self.reuse_tree = reuse_tree
+        self.tree = None
+        self.ponder_iterations = ponder_iterations
+        self.ponder_thread = None
+        self.ponder_stop = None
+        self.nb_pondered = 0
+        self.nb_workers = nb_workers
+        self.pool = None
+        self.nb_threads = nb_threads
+        self.batch_size = batch_size
+        self.batch_processes = batch_processes
+        self.batch_pool = None
+        self.tree_class = tree_class
+        self.progressive_widening = progressive_widening
+        self.rollout = rollout
+        self.batch_evaluator = batch_evaluator
+
     def play(self, percepts, player, step, time_left):
         """
         This function is used to play a move according
@@ -57,46 +115,174 @@ class MyAgent(Agent):
         print("step:", step)
         print("time left:", time_left if time_left else '+inf')
 
-        initial_board = CustomBoard(percepts)
+        initial_board = self.board_engine(percepts)
 
         try:
-            tree = Tree(player=player, initial_board=initial_board)
+            self.stop_pondering()
+            tree = self.get_tree(initial_board, player)
 
-            nb_iterations_left = self.get_nb_iteration_left(initial_board,player)
+            nb_iterations = self.get_nb_iteration_left(initial_board,player)
+            nb_iterations_left = nb_iterations
+            if self.ponder_iterations > 0:
+                # The simulations done while pondering count in the budget
+                nb_iterations_left = max(1, nb_iterations_left - tree.root.N)
             maximum_time_to_spend = self.get_maximum_time_to_spend(step,time_left)
 
             if maximum_time_to_spend == 0:
                 shortest_path = initial_board.get_shortest_path(player)
                 return 'P', shortest_path[0][0], shortest_path[0][1]
 
-            start_time = time()
-            while True:
-                print(f"Iteration remaining {nb_iterations_left}")
+            worker_results = None
+            if self.nb_workers > 1:
+                worker_results = self.get_pool().map_async(search_worker, [
+                    (self.tree_class, self.board_engine, percepts, player,
+                     self.get_tree_options(), nb_iterations,
+                     maximum_time_to_spend, random.getrandbits(32))
+                    for _ in range(self.nb_workers - 1)])
 
-                promisingNode = tree.getInterestingNode()
-
-                tree.expand(promisingNode)
-
-                simulation_result = tree.simulate(promisingNode)
+            if self.batch_size > 1:
+                evaluator = self.batch_evaluator
+                if self.batch_processes > 0:
+                    evaluator = self.evaluate_in_pool
+                run_batched_search(tree, self.batch_size, nb_iterations_left,
+                                   maximum_time_to_spend, evaluator)
+            elif self.nb_threads > 1:
+                run_parallel_search(tree, self.nb_threads, nb_iterations_left,
+                                    maximum_time_to_spend)
+            else:
+                run_search(tree, nb_iterations_left, maximum_time_to_spend)
 
-                tree.backPropagate(promisingNode, simulation_result)
-                nb_iterations_left -= 1
-                if nb_iterations_left == 0:
-                    break
-                elapsed_time = time() - start_time
-                if elapsed_time >= maximum_time_to_spend:
-                    break
+            if worker_results is not None:
+                self.merge_root_children(tree, worker_results.get())
 
             # Phase 5 - Simulation ended, chose the best action to do
             best_child_node_action = tree.get_best_child_action()
-            return best_child_node_action
+            path_cache = getattr(tree.root.board, 'path_cache', None)
+            if path_cache is not None:
+                print(f"Path cache: {path_cache.hits} hits, "
+                      f"{path_cache.misses} misses")
+            if tree.transpositions is not None:
+                print(f"Transpositions: {tree.transpositions.boards_shared} "
+                      f"boards shared")
+            if tree.lazy_expansion:
+                print(f"Lazy expansion: {tree.nb_avoided_clones} clones and "
+                      f"{tree.nb_avoided_wall_checks} wall checks avoided")
+            if self.ponder_iterations > 0 and self.reuse_tree:
+                self.start_pondering(tree, best_child_node_action)
+            # The tree works on action codes, the referee on tuples
+            return decode_action(best_child_node_action)
 
         except:
+            self.tree = None
             print(traceback.format_exc())
             print(initial_board)
             # In case of unexpected failure, do a random action
             return random.choice(initial_board.get_actions(player))
 
+    def get_tree(self, initial_board, player):
+        """
+        Returns the tree of the previous play moved to the grandchild
+        matching initial_board, or a new tree if there is none
+
+        Args:
+            initial_board: Current board
+            player: Current playing player number
+        """
+        tree = self.tree
+        if tree is not None and tree.root.player == 1 - player and \
+                tree.advance_root(initial_board):
+            print(f"Reusing tree: {tree.root.N} simulations, "
+                  f"{self.nb_pondered} while pondering")
+            if tree.transpositions is not None:
+                tree.transpositions.reset_counters()
+        else:
+            tree = self.tree_class(player=player, initial_board=initial_board,
+                                   **self.get_tree_options())
+        self.tree = tree if self.reuse_tree else None
+        return tree
+
+    def get_tree_options(self):
+        """Returns the keyword arguments of the trees of the search"""
+        return {'transposition_size': self.transposition_size,
+                'progressive_widening': self.progressive_widening,
+                'rollout': self.rollout}
+
+    def get_pool(self):
+        """Returns the pool of the root-parallel searches, created at the
+        first use"""
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.nb_workers - 1)
+        return self.pool
+
+    def evaluate_in_pool(self, boards):
+        """Evaluator of the batched search sending the boards to a process
+        pool, see Tree.batch_iteration"""
+        if self.batch_pool is None:
+            self.batch_pool = multiprocessing.Pool(self.batch_processes)
+        return self.batch_pool.map(
+            evaluate_percepts, [board_percepts(board) for board in boards])
+
+    @staticmethod
+    def merge_root_children(tree, worker_results):
+        """
+        Add the U and N of the root children of the worker searches to the
+        children of the same action in tree
+
+        Args:
+            tree: Tree searched in this process
+            worker_results: (action, U, N) of the root children of each worker
+        """
+        children = {child.action: child for child in tree.root.children}
+        for result in worker_results:
+            for action, U, N in result:
+                child = children.get(action)
+                if child is None:
+                    continue
+                child.U += U
+                child.N += N
+                tree.root.U += U
+                tree.root.N += N
+
+    def start_pondering(self, tree, action):
+        """
+        Continue the search below the child of the root playing action in a
+        background thread, until the next play or ponder_iterations
+        iterations
+
+        Args:
+            tree: Tree of the play that chose action
+            action: Code of the action returned by the play
+        """
+        node = next(child for child in tree.root.children
+                    if child.action == action)
+        self.nb_pondered = 0
+        self.ponder_stop = threading.Event()
+        self.ponder_thread = threading.Thread(
+            target=self.ponder, args=(tree, node, self.ponder_stop),
+            daemon=True)
+        self.ponder_thread.start()
+
+    def ponder(self, tree, node, stop):
+        """Body of the pondering thread, see start_pondering"""
+        try:
+            while self.nb_pondered < self.ponder_iterations \
+                    and not stop.is_set():
+                promisingNode = tree.getInterestingNode(node)
+                tree.expand(promisingNode)
+                simulation_result = tree.simulate(promisingNode)
+                tree.backPropagate(promisingNode, simulation_result)
+                self.nb_pondered += 1
+        except:
+            print(traceback.format_exc())
+            self.tree = None
+
+    def stop_pondering(self):
+        """Stop the pondering thread and wait for its current iteration"""
+        if self.ponder_thread is not None:
+            self.ponder_stop.set()
+            self.ponder_thread.join()
+            self.ponder_thread = None
+
     def get_maximum_time_to_spend(self, step, time_left):
         """
         This functions estimates the time to spend for a play
@@ -135,5 +321,176 @@ class MyAgent(Agent):
         return nb_iterations_left
 
 
+def run_search(tree, nb_iterations_left, maximum_time_to_spend, verbose=True):
+    """
+    Run MCTS iterations on tree until the number of iterations or the time
+    is spent
+    """
+    start_time = time()
+    while True:
+        if verbose:
+            print(f"Iteration remaining {nb_iterations_left}")
+
+        promisingNode = tree.getInterestingNode()
+
+        tree.expand(promisingNode)
+
+        simulation_result = tree.simulate(promisingNode)
+
+        tree.backPropagate(promisingNode, simulation_result)
+        nb_iterations_left -= 1
+        if nb_iterations_left == 0:
+            break
+        elapsed_time = time() - start_time
+        if elapsed_time >= maximum_time_to_spend:
+            break
+
+
+def run_parallel_search(tree, nb_threads, nb_iterations_left,
+                        maximum_time_to_spend):
+    """
+    Run MCTS iterations on tree from nb_threads threads sharing it, until
+    the number of iterations or the time is spent
+    """
+    start_time = time()
+    iterations = iter(range(nb_iterations_left))
+
+    def work():
+        for _ in iterations:
+            tree.parallel_iteration()
+            if time() - start_time >= maximum_time_to_spend:
+                break
+
+    threads = [threading.Thread(target=work) for _ in range(nb_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_batched_search(tree, batch_size, nb_iterations_left,
+                       maximum_time_to_spend, evaluator=None):
+    """
+    Run batches of MCTS iterations on tree until the number of iterations
+    or the time is spent
+    """
+    start_time = time()
+    while nb_iterations_left > 0:
+        print(f"Iteration remaining {nb_iterations_left}")
+        batch = min(batch_size, nb_iterations_left)
+        tree.batch_iteration(batch, evaluator)
+        nb_iterations_left -= batch
+        if time() - start_time >= maximum_time_to_spend:
+            break
+
+
+def board_percepts(board):
+    """Returns the percepts of a board, light enough to send to a
+    process"""
+    return {'pawns': list(board.pawns), 'goals': board.goals,
+            'horiz_walls': board.horiz_walls,
+            'verti_walls': board.verti_walls, 'nb_walls': board.nb_walls}
+
+
+def evaluate_percepts(percepts):
+    """Evaluates a board of a batch in a pool process, see
+    MyAgent.evaluate_in_pool"""
+    return evaluate_boards([CustomBoard(percepts)])[0]
+
+
+def search_worker(args):
+    """
+    Independent search of the root-parallel mode, run in a pool process
+
+    Returns:
+        (action, U, N) of each root child
+    """
+    (tree_class, board_engine, percepts, player, tree_options,
+     nb_iterations, maximum_time_to_spend, seed) = args
+    random.seed(seed)
+    tree = tree_class(player=player, initial_board=board_engine(percepts),
+                      **tree_options)
+    run_search(tree, nb_iterations, maximum_time_to_spend, verbose=False)
+    return [(child.action, child.U, child.N) for child in tree.root.children]
+
+
+BOARD_ENGINES = {'custom': CustomBoard, 'bitboard': BitBoard}
+
+
+def add_arguments(agent, parser):
+    parser.add_argument("--engine", choices=sorted(BOARD_ENGINES),
+                        default='custom',
+                        help="board representation used by the search "
+                             "(default: %(default)s)")
+    parser.add_argument("--transpositions", type=int, default=0,
+                        metavar="SIZE",
+                        help="maximum number of positions in the "
+                             "transposition table, 0 to disable it "
+                             "(default: %(default)s)")
+    parser.add_argument("--no-tree-reuse", action="store_true",
+                        help="start a new search tree at each move")
+    parser.add_argument("--ponder", type=int, default=0, metavar="ITERATIONS",
+                        help="maximum number of iterations searched on the "
+                             "opponent's time, 0 to disable pondering "
+                             "(default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of independent searches merged at the "
+                             "root, run in parallel processes "
+                             "(default: %(default)s)")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="number of threads searching the same tree "
+                             "(default: %(default)s)")
+    parser.add_argument("--batch", type=int, default=1, metavar="SIZE",
+                        help="number of leaves evaluated together "
+                             "(default: %(default)s)")
+    parser.add_argument("--batch-processes", type=int, default=0,
+                        help="number of processes evaluating the batches, "
+                             "0 to evaluate them in the agent process "
+                             "(default: %(default)s)")
+    parser.add_argument("--compact", action="store_true",
+                        help="store the search tree in arrays and rebuild "
+                             "the boards of the nodes on demand")
+    parser.add_argument("--widening", action="store_true",
+                        help="add the wall children of the nodes "
+                             "progressively, best walls first")
+    parser.add_argument("--rollout-depth", type=int, default=0,
+                        metavar="PLIES",
+                        help="maximum number of plies of the light-policy "
+                             "playouts simulating the leaves, 0 to score "
+                             "the leaves without playing "
+                             "(default: %(default)s)")
+    parser.add_argument("--distance-maps", action="store_true",
+                        help="evaluate the leaves of a batch with the "
+                             "distance maps of all their boards computed "
+                             "at once, the pawns not blocking each other")
+
+
+def setup_agent(agent, parser, args):
+    agent.board_engine = BOARD_ENGINES[args.engine]
+    agent.transposition_size = args.transpositions
+    agent.reuse_tree = not args.no_tree_reuse
+    agent.ponder_iterations = args.ponder
+    agent.nb_workers = args.workers
+    agent.nb_threads = args.threads
+    agent.batch_size = args.batch
+    agent.batch_processes = args.batch_processes
+    agent.progressive_widening = args.widening
+    if args.compact:
+        if args.transpositions > 0 or args.widening:
+            parser.error("--compact cannot be used with --transpositions "
+                         "or --widening")
+        agent.tree_class = CompactTree
+    if args.rollout_depth > 0:
+        if args.batch_processes > 0:
+            parser.error("--rollout-depth cannot be used with "
+                         "--batch-processes")
+        agent.rollout = LightRollout(depth=args.rollout_depth)
+    if args.distance_maps:
+        if args.rollout_depth > 0 or args.batch_processes > 0:
+            parser.error("--distance-maps cannot be used with "
+                         "--rollout-depth or --batch-processes")
+        agent.batch_evaluator = batch_min_steps
+
+
 if __name__ == "__main__":
-    agent_main(MyAgent())
+    agent_main(MyAgent(), add_arguments, setup_agent)
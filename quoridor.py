@@ -16,10 +16,17 @@ along with this program; if not, see <http://www.gnu.org/licenses/>.
 import random
 import itertools
 import operator
+from collections import deque
 
 PLAYER1 = 0
 PLAYER2 = 1
 
+# Directions a pawn can leave a cell through, as bits of Board.open_dirs
+OPEN_UP = 1
+OPEN_DOWN = 2
+OPEN_LEFT = 4
+OPEN_RIGHT = 8
+
 
 class InvalidAction(Exception):
 
@@ -37,6 +44,346 @@ class NoPath(Exception):
         return "Exception: no path to reach the goal"
 
 
+def open_dirs_grid(size, horiz_walls=(), verti_walls=()):
+    """Returns a size x size grid holding for each cell the bits of the
+    directions that are neither blocked by a border nor by a wall.
+    """
+    open_dirs = []
+    for i in range(size):
+        row = []
+        for j in range(size):
+            dirs = 0
+            if i > 0:
+                dirs |= OPEN_UP
+            if i < size - 1:
+                dirs |= OPEN_DOWN
+            if j > 0:
+                dirs |= OPEN_LEFT
+            if j < size - 1:
+                dirs |= OPEN_RIGHT
+            row.append(dirs)
+        open_dirs.append(row)
+    for pos in horiz_walls:
+        set_wall_edges(open_dirs, pos, True, False)
+    for pos in verti_walls:
+        set_wall_edges(open_dirs, pos, False, False)
+    return open_dirs
+
+
+def set_wall_edges(open_dirs, pos, is_horiz, is_open):
+    """Closes (or reopens if is_open) the four cell edges crossed by the
+    wall in position pos. Two legal walls never share an edge, so
+    reopening the edges of a wall that has just been removed is exact.
+    """
+    (x, y) = pos
+    if is_horiz:
+        edges = ((x, y, OPEN_DOWN), (x, y + 1, OPEN_DOWN),
+                 (x + 1, y, OPEN_UP), (x + 1, y + 1, OPEN_UP))
+    else:
+        edges = ((x, y, OPEN_RIGHT), (x + 1, y, OPEN_RIGHT),
+                 (x, y + 1, OPEN_LEFT), (x + 1, y + 1, OPEN_LEFT))
+    for (i, j, direction) in edges:
+        if is_open:
+            open_dirs[i][j] |= direction
+        else:
+            open_dirs[i][j] &= ~direction
+
+
+def open_neighbors(open_dirs, pos):
+    """Returns the cells reachable from pos by a simple step (no jump above
+    a pawn), in the order down, up, right, left.
+    """
+    (x, y) = pos
+    dirs = open_dirs[x][y]
+    moves = []
+    if dirs & OPEN_DOWN:
+        moves.append((x + 1, y))
+    if dirs & OPEN_UP:
+        moves.append((x - 1, y))
+    if dirs & OPEN_RIGHT:
+        moves.append((x, y + 1))
+    if dirs & OPEN_LEFT:
+        moves.append((x, y - 1))
+    return moves
+
+
+# Directions of the simple steps, in the order of open_neighbors
+DIRECTIONS = (OPEN_DOWN, OPEN_UP, OPEN_RIGHT, OPEN_LEFT)
+# Directions of the diagonal moves around an opponent pawn met in each
+# direction
+SIDE_DIRECTIONS = {OPEN_DOWN: (OPEN_RIGHT, OPEN_LEFT),
+                   OPEN_UP: (OPEN_LEFT, OPEN_RIGHT),
+                   OPEN_RIGHT: (OPEN_DOWN, OPEN_UP),
+                   OPEN_LEFT: (OPEN_UP, OPEN_DOWN)}
+
+
+def _build_cell_steps(size=9):
+    """For every cell, compute the cells reached by a step in each direction
+    not crossing the border, as a dictionary indexed by direction.
+    """
+    deltas = {OPEN_DOWN: (1, 0), OPEN_UP: (-1, 0), OPEN_RIGHT: (0, 1),
+              OPEN_LEFT: (0, -1)}
+    return [[{direction: (x + dx, y + dy)
+              for (direction, (dx, dy)) in deltas.items()
+              if 0 <= x + dx < size and 0 <= y + dy < size}
+             for y in range(size)] for x in range(size)]
+
+
+# Neighbours of the cells of a 9 x 9 board, indexed by [x][y][direction]
+CELL_STEPS = _build_cell_steps()
+
+
+def legal_pawn_moves(open_dirs, pawn, opponent_pos):
+    """Returns the cells where pawn can move, from the open edges of the
+    cells: the simple steps, in the order of open_neighbors, then the
+    straight jump above a facing opponent pawn or, if a wall or the border
+    is behind it, the diagonal moves beside it.
+    """
+    (x, y) = pawn
+    (x_op, y_op) = opponent_pos
+    opponent_pos = (x_op, y_op)
+    dirs = open_dirs[x][y]
+    steps = CELL_STEPS[x][y]
+    moves = []
+    jumps = []
+    for direction in DIRECTIONS:
+        if not dirs & direction:
+            continue
+        cell = steps[direction]
+        if cell != opponent_pos:
+            moves.append(cell)
+            continue
+        op_dirs = open_dirs[x_op][y_op]
+        op_steps = CELL_STEPS[x_op][y_op]
+        if op_dirs & direction:
+            jumps.append(op_steps[direction])
+        else:
+            jumps.extend(op_steps[side] for side in SIDE_DIRECTIONS[direction]
+                         if op_dirs & side)
+    return moves + jumps
+
+
+def goal_distance_map(open_dirs, goal):
+    """Returns the grid of the number of steps needed to reach the goal
+    row from each cell, ignoring the pawns (None if the row cannot be
+    reached). A single BFS starts from the whole goal row.
+    """
+    size = len(open_dirs)
+    distances = [[None] * size for i in range(size)]
+    frontier = [(goal, j) for j in range(size)]
+    for j in range(size):
+        distances[goal][j] = 0
+    distance = 0
+    while frontier:
+        distance += 1
+        next_frontier = []
+        for pos in frontier:
+            for (x, y) in open_neighbors(open_dirs, pos):
+                if distances[x][y] is None:
+                    distances[x][y] = distance
+                    next_frontier.append((x, y))
+        frontier = next_frontier
+    return distances
+
+
+def path_from_distance_map(distances, open_dirs, pawn, opponent_pos):
+    """Returns a shortest path of pawn down the distance map if the
+    opponent cannot lie on nor shorten any shortest route (checked with
+    a lower bound of its distance from pawn), None otherwise.
+    Raises NoPath if the goal row cannot be reached.
+    """
+    (x, y) = pawn
+    distance = distances[x][y]
+    if distance is None:
+        raise NoPath()
+    (x_op, y_op) = opponent_pos
+    op_distance = distances[x_op][y_op]
+    if op_distance is not None and \
+            abs(x - x_op) + abs(y - y_op) + op_distance < distance + 2:
+        return None
+    path = []
+    while distance > 0:
+        distance -= 1
+        for (x, y) in open_neighbors(open_dirs, (x, y)):
+            if distances[x][y] == distance:
+                break
+        path.append((x, y))
+    return path
+
+
+def wall_index(pos, is_horiz, size=9):
+    """Returns the bit of a wall placement in the masks returned by
+    legal_wall_mask: horizontal walls come first, then vertical walls.
+    """
+    (x, y) = pos
+    index = x * (size - 1) + y
+    return index if is_horiz else index + (size - 1) ** 2
+
+
+# Integer codes of the actions of a 9 x 9 board: the pawn moves to each
+# cell come first, then the wall placements in the order of wall_index
+ACTIONS = [('P', x, y) for x in range(9) for y in range(9)] + \
+    [('WH', x, y) for x in range(8) for y in range(8)] + \
+    [('WV', x, y) for x in range(8) for y in range(8)]
+ACTION_CODES = {action: code for (code, action) in enumerate(ACTIONS)}
+# Codes below this one are pawn moves
+NB_PAWN_ACTIONS = 81
+
+
+def encode_action(action):
+    """Returns the integer code of an action, see ACTIONS"""
+    (kind, x, y) = action
+    return ACTION_CODES[(kind, x, y)]
+
+
+def decode_action(code):
+    """Returns the action tuple of an integer code, see ACTIONS"""
+    return ACTIONS[code]
+
+
+def edge_key(pos, new_pos):
+    """Returns a key identifying the edge between two adjacent cells"""
+    (x, y) = pos
+    (x_, y_) = new_pos
+    if x_ == x + 1:
+        return (x, y, OPEN_DOWN)
+    if x_ == x - 1:
+        return (x_, y_, OPEN_DOWN)
+    if y_ == y + 1:
+        return (x, y, OPEN_RIGHT)
+    return (x_, y_, OPEN_RIGHT)
+
+
+def wall_edges(pos, is_horiz):
+    """Returns the keys of the two edges cut by a wall"""
+    (x, y) = pos
+    if is_horiz:
+        return ((x, y, OPEN_DOWN), (x, y + 1, OPEN_DOWN))
+    return ((x, y, OPEN_RIGHT), (x + 1, y, OPEN_RIGHT))
+
+
+def _build_wall_slot_tables(size=9):
+    """For every wall slot, in the order of wall_index, compute the mask of
+    the slots it overlaps or crosses (itself included), the edges it cuts
+    (see wall_edges) and the mask of its neighbourhood: the slots extending
+    it and the slots crossing it or its ends. Also compute, for every cell,
+    the mask of the slots around it.
+    """
+    def slot_mask(slots):
+        mask = 0
+        for (x, y, is_horiz) in slots:
+            if 0 <= x < size - 1 and 0 <= y < size - 1:
+                mask |= 1 << wall_index((x, y), is_horiz, size)
+        return mask
+
+    conflicts, edges, neighbourhoods = [], [], []
+    for is_horiz in (True, False):
+        for x in range(size - 1):
+            for y in range(size - 1):
+                dx, dy = (0, 1) if is_horiz else (1, 0)
+                conflicts.append(slot_mask(
+                    [(x, y, is_horiz), (x - dx, y - dy, is_horiz),
+                     (x + dx, y + dy, is_horiz), (x, y, not is_horiz)]))
+                edges.append(wall_edges((x, y), is_horiz))
+                neighbourhoods.append(slot_mask(
+                    [(x - 2 * dx, y - 2 * dy, is_horiz),
+                     (x + 2 * dx, y + 2 * dy, is_horiz)] +
+                    [(x + i, y + j, not is_horiz)
+                     for i in range(-1, 2) for j in range(-1, 2)]))
+    cell_neighbourhoods = [
+        slot_mask([(x + i, y + j, is_horiz) for i in (-1, 0) for j in (-1, 0)
+                   for is_horiz in (True, False)])
+        for x in range(size) for y in range(size)]
+    return conflicts, edges, neighbourhoods, cell_neighbourhoods
+
+
+# Tables of the wall slots of a 9 x 9 board indexed by wall_index, and of
+# the slots around each cell indexed by x * 9 + y
+WALL_CONFLICTS, WALL_EDGES, WALL_NEIGHBOURHOODS, CELL_NEIGHBOURHOODS = \
+    _build_wall_slot_tables()
+
+# Tables of the action codes: the kind of each action, its position and the
+# edges it cuts (none for the pawn moves). The code of a pawn move is the
+# index x * 9 + y of its cell, the one of a wall NB_PAWN_ACTIONS plus its
+# wall_index.
+KIND_PAWN, KIND_WH, KIND_WV = 0, 1, 2
+ACTION_KINDS = bytes([KIND_PAWN] * NB_PAWN_ACTIONS + [KIND_WH] * 64 +
+                     [KIND_WV] * 64)
+ACTION_POSITIONS = [(x, y) for (_, x, y) in ACTIONS]
+ACTION_EDGES = [()] * NB_PAWN_ACTIONS + WALL_EDGES
+
+
+def mask_bits(mask):
+    """Yield the index of every bit set in mask"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def shortest_path_edges(board, player):
+    """Returns the set of edges crossed by the current shortest path of
+    player (a jump crosses the two edges around the opponent). A wall that
+    cuts none of them leaves this path valid.
+    Raises NoPath if the player has no path.
+    """
+    (x_op, y_op) = board.pawns[(player + 1) % 2]
+    (x, y) = board.pawns[player]
+    edges = set()
+    for (x_, y_) in board.get_shortest_path(player):
+        distance = abs(x_ - x) + abs(y_ - y)
+        if distance == 1:
+            edges.add(edge_key((x, y), (x_, y_)))
+        elif distance > 1:
+            edges.add(edge_key((x, y), (x_op, y_op)))
+            edges.add(edge_key((x_op, y_op), (x_, y_)))
+        (x, y) = (x_, y_)
+    return edges
+
+
+def cut_players(paths, pos, is_horiz):
+    """Returns the players whose shortest path (from paths, as returned by
+    shortest_path_edges) is cut by the wall. Without paths, both players
+    have to be searched.
+    """
+    if paths is None:
+        return (PLAYER1, PLAYER2)
+    edges = WALL_EDGES[wall_index(pos, is_horiz)]
+    return [player for player in (PLAYER1, PLAYER2)
+            if not paths[player].isdisjoint(edges)]
+
+
+def legal_wall_mask(board, paths=None):
+    """Returns the legality of every wall placement on board as a bitmask
+    indexed by wall_index.
+    The shortest paths of both players are searched once (or given in
+    paths, as returned by shortest_path_edges); a wall that may close a
+    barrier only triggers a new search for the players whose path it cuts.
+    If a player has no path already, every wall triggers a new search.
+    """
+    size = board.size
+    if paths is None:
+        try:
+            paths = [shortest_path_edges(board, PLAYER1),
+                     shortest_path_edges(board, PLAYER2)]
+        except NoPath:
+            paths = None
+    mask = 0
+    for i in range(size - 1):
+        for j in range(size - 1):
+            for is_horiz in (True, False):
+                if not board.is_wall_slot_free((i, j), is_horiz):
+                    continue
+                if paths is not None and \
+                        not board.can_close_barrier((i, j), is_horiz):
+                    mask |= 1 << wall_index((i, j), is_horiz, size)
+                    continue
+                cut = cut_players(paths, (i, j), is_horiz)
+                if not cut or board.wall_keeps_paths((i, j), is_horiz, cut):
+                    mask |= 1 << wall_index((i, j), is_horiz, size)
+    return mask
+
+
 class Board:
 
     """
@@ -73,6 +420,9 @@ class Board:
                 self.verti_walls.append((x, y))
             self.nb_walls[0] = percepts.nb_walls[0]
             self.nb_walls[1] = percepts.nb_walls[1]
+        self.open_dirs = open_dirs_grid(self.size, self.horiz_walls,
+                                        self.verti_walls)
+        self.distance_maps = [None, None]
 
     def pretty_print(self):
         """print of the representation"""
@@ -129,6 +479,8 @@ class Board:
             clone_board.horiz_walls.append((x, y))
         for (x, y) in self.verti_walls:
             clone_board.verti_walls.append((x, y))
+        clone_board.open_dirs = [row[:] for row in self.open_dirs]
+        clone_board.distance_maps = self.distance_maps[:]
         return clone_board
 
     def can_move_here(self, i, j, player):
@@ -138,70 +490,13 @@ class Board:
         return self.is_pawn_move_ok(self.pawns[player], (i, j),
             self.pawns[(player + 1) % 2])
 
-    def is_simplified_pawn_move_ok(self, former_pos, new_pos):
-        """Returns True if moving one pawn from former_pos to new_pos
-        is valid i.e. it respects the rules of quoridor (without the
-        heap move above the opponent)
-        """
-        (row_form, col_form) = former_pos
-        (row_new, col_new) = new_pos
-
-        if (row_form == row_new and col_form == col_new) or \
-            row_new >= self.size or row_new < 0 or \
-            col_new >= self.size or col_new < 0:
-            return False
-        wall_right = ((row_form, col_form) in self.verti_walls) or \
-                    ((row_form - 1, col_form) in self.verti_walls)
-        wall_left = ((row_form - 1, col_form - 1) in self.verti_walls) or \
-                    ((row_form, col_form - 1) in self.verti_walls)
-        wall_up = ((row_form - 1, col_form - 1) in self.horiz_walls) or \
-                    ((row_form - 1, col_form) in self.horiz_walls)
-        wall_down = ((row_form, col_form) in self.horiz_walls) or \
-                    ((row_form, col_form - 1) in self.horiz_walls)
-
-        # check that the pawn doesn't move through a wall
-        if row_new == row_form + 1 and col_new == col_form:
-            return not wall_down
-        if row_new == row_form - 1 and col_new == col_form:
-            return not wall_up
-        if row_new == row_form and col_new == col_form + 1:
-            return not wall_right
-        if row_new == row_form and col_new == col_form - 1:
-            return not wall_left
-        return False
-
     def is_pawn_move_ok(self, former_pos, new_pos, opponent_pos):
         """Returns True if moving one pawn from former_pos to new_pos is
         valid i.e. it respects the rules of quoridor
         """
-        (x_form, y_form) = former_pos
         (x_new, y_new) = new_pos
-        (x_op, y_op) = opponent_pos
-
-        if (x_op == x_new and y_op == y_new) or \
-            (x_form == x_new and y_form == y_new):
-            return False
-
-        # Move of 2 (above the opponent pawn) or diagonal
-        def manhattan(pos1, pos2):
-            return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
-
-        if manhattan(former_pos, opponent_pos) + \
-            manhattan(opponent_pos, new_pos) == 2:
-            ok = self.is_pawn_move_ok(opponent_pos, new_pos, (-10, -10)) and \
-                self.is_pawn_move_ok(former_pos, opponent_pos, (-10, -10))
-            if not ok:
-                return False
-            # Check if the move is in straight angle that there were no
-            # possibility of moving straight ahead
-            if abs(x_form - x_new) ** 2 + abs(y_form - y_new) ** 2 == 2:
-                # There is a possibility of moving straight ahead leading the
-                # move to be illegal
-                return not self.is_pawn_move_ok(opponent_pos,
-                    (x_op + (x_op - x_form), y_op + (y_op - y_form)),
-                    (-10, -10))
-            return True
-        return self.is_simplified_pawn_move_ok(former_pos, new_pos)
+        return (x_new, y_new) in legal_pawn_moves(self.open_dirs, former_pos,
+                                                  opponent_pos)
 
     def paths_exist(self):
         """Returns True if there exists a path from both players to
@@ -214,35 +509,58 @@ class Board:
         except NoPath:
             return False
 
+    def distance_map(self, player):
+        """Returns the grid of distances to the goal row of player,
+        ignoring the pawns (see goal_distance_map). It is kept until the
+        next wall is placed.
+        """
+        if self.distance_maps[player] is None:
+            self.distance_maps[player] = goal_distance_map(
+                self.open_dirs, self.goals[player])
+        return self.distance_maps[player]
+
     def get_shortest_path(self, player):
         """ Returns a shortest path for player to reach its goal
         if player is on its goal, the shortest path is an empty list
         if no path exists, exception is thrown.
+        The path is read on the distance map unless the opponent is in the
+        way, in which case a BFS is done.
         """
+        (a, b) = self.pawns[player]
+        if a == self.goals[player]:
+            return []
+        path = path_from_distance_map(self.distance_map(player),
+                                      self.open_dirs, self.pawns[player],
+                                      self.pawns[(player + 1) % 2])
+        if path is not None:
+            return path
+        return self.search_shortest_path(player)
+
+    def search_shortest_path(self, player):
+        """Returns a shortest path for player, searched with a BFS that
+        takes the opponent pawn into account.
+        """
+        (x_op, y_op) = self.pawns[(player + 1) % 2]
 
         def get_pawn_moves(pos):
             (x, y) = pos
-            positions = [(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1),
-                (x + 1, y + 1), (x - 1, y - 1), (x + 1, y - 1), (x - 1, y + 1),
-                (x + 2, y), (x - 2, y), (x, y + 2), (x, y - 2)]
-            moves = []
-            for new_pos in positions:
-                if self.is_pawn_move_ok(pos, new_pos,
-                    self.pawns[(player + 1) % 2]):
-                    moves.append(new_pos)
-            return moves
+            if abs(x - x_op) + abs(y - y_op) != 1:
+                # No jump possible: the open edges are the moves
+                return open_neighbors(self.open_dirs, pos)
+            return legal_pawn_moves(self.open_dirs, pos, (x_op, y_op))
 
         (a, b) = self.pawns[player]
         if a == self.goals[player]:
             return []
+        # Cells already queued by the BFS
         visited = [[False for i in range(self.size)] for i in range(self.size)]
         # Predecessor matrix in the BFS
         prede = [[None for i in range(self.size)] for i in range(self.size)]
-        neighbors = [self.pawns[player]]
+        neighbors = deque([self.pawns[player]])
+        visited[a][b] = True
         while len(neighbors) > 0:
-            neighbor = neighbors.pop(0)
+            neighbor = neighbors.popleft()
             (x, y) = neighbor
-            visited[x][y] = True
             if x == self.goals[player]:
                 succ = [neighbor]
                 curr = prede[x][y]
@@ -252,11 +570,10 @@ class Board:
                     curr = prede[x_][y_]
                 succ.reverse()
                 return succ
-            unvisited_succ = [(x_, y_) for (x_, y_) in
-                get_pawn_moves(neighbor) if not visited[x_][y_]]
-            for n_ in unvisited_succ:
+            for n_ in get_pawn_moves(neighbor):
                 (x_, y_) = n_
-                if not n_ in neighbors:
+                if not visited[x_][y_]:
+                    visited[x_][y_] = True
                     neighbors.append(n_)
                     prede[x_][y_] = neighbor
         raise NoPath()
@@ -280,6 +597,8 @@ class Board:
             self.horiz_walls.append(pos)
         else:
             self.verti_walls.append(pos)
+        set_wall_edges(self.open_dirs, pos, is_horiz, False)
+        self.distance_maps = [None, None]
         self.nb_walls[player] -= 1
 
     def move_pawn(self, new_pos, player):
@@ -293,65 +612,65 @@ class Board:
         Returns True if it is possible to put a wall in position pos
         with direction specified by is_horiz.
         """
+        return self.is_wall_slot_free(pos, is_horiz) and \
+            self.wall_keeps_paths(pos, is_horiz)
+
+    def is_wall_slot_free(self, pos, is_horiz):
+        """Returns True if a wall in position pos would be on the board
+        without overlapping or crossing another wall.
+        """
         (x, y) = pos
         if x >= self.size - 1 or x < 0 or y >= self.size - 1 or y < 0:
             return False
-        if not (tuple(pos) in self.horiz_walls or
-                tuple(pos) in self.verti_walls):
-            wall_horiz_right = (x, y + 1) in self.horiz_walls
-            wall_horiz_left = (x, y - 1) in self.horiz_walls
-            wall_vert_up = (x - 1, y) in self.verti_walls
-            wall_vert_down = (x + 1, y) in self.verti_walls
-            if is_horiz:
-                if wall_horiz_right or wall_horiz_left:
-                    return False
-                self.horiz_walls.append(tuple(pos))
-                if not self.paths_exist():
-                    a = self.horiz_walls.pop()
-                    return False
-                self.horiz_walls.pop()
-                return True
-            else:
-                if wall_vert_up or wall_vert_down:
-                    return False
-                self.verti_walls.append(tuple(pos))
-                if not self.paths_exist():
-                    a = self.verti_walls.pop()
-                    return False
-                self.verti_walls.pop()
-                return True
-        else:
+        if tuple(pos) in self.horiz_walls or tuple(pos) in self.verti_walls:
             return False
+        if is_horiz:
+            return not ((x, y + 1) in self.horiz_walls or
+                        (x, y - 1) in self.horiz_walls)
+        return not ((x - 1, y) in self.verti_walls or
+                    (x + 1, y) in self.verti_walls)
+
+    def can_close_barrier(self, pos, is_horiz):
+        """Returns True if the wall may disconnect a player from its goal.
+        Board keeps no wall connectivity index, so any wall may.
+        """
+        return True
+
+    def wall_keeps_paths(self, pos, is_horiz, players=(PLAYER1, PLAYER2)):
+        """Returns True if every player of players still has a path to its
+        goal once the wall is put in position pos.
+        """
+        # Only the open edges are read by the search: the wall lists and the
+        # distance maps are not updated for a temporary wall
+        set_wall_edges(self.open_dirs, pos, is_horiz, False)
+        try:
+            for player in players:
+                self.search_shortest_path(player)
+            possible = True
+        except NoPath:
+            possible = False
+        set_wall_edges(self.open_dirs, pos, is_horiz, True)
+        return possible
 
     def get_legal_pawn_moves(self, player):
         """Returns legal moves for the pawn of player."""
-        (x, y) = self.pawns[player]
-        positions = [(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1),
-        (x + 1, y + 1), (x - 1, y - 1), (x + 1, y - 1), (x - 1, y + 1),
-        (x + 2, y), (x - 2, y), (x, y + 2), (x, y - 2)]
-        moves = []
-        for new_pos in positions:
-            if self.is_pawn_move_ok(self.pawns[player], new_pos,
-                self.pawns[(player + 1) % 2]):
-                moves.append(('P', new_pos[0], new_pos[1]))
-        return moves
+        return [('P', x, y) for (x, y) in legal_pawn_moves(
+            self.open_dirs, self.pawns[player], self.pawns[(player + 1) % 2])]
 
     def get_legal_wall_moves(self, player):
         """Returns legal wall placements (adding a wall
         somewhere) for player.
         """
-        positions = []
         moves = []
         if self.nb_walls[player] <= 0:
             return moves
+        mask = legal_wall_mask(self)
         for i in range(self.size - 1):
             for j in range(self.size - 1):
-                positions.append((i, j))
-        for pos in positions:
-            if self.is_wall_possible_here(pos, True):
-                moves.append(('WH', pos[0], pos[1]))
-            if self.is_wall_possible_here(pos, False):
-                moves.append(('WV', pos[0], pos[1]))
+                if mask >> wall_index((i, j), True, self.size) & 1:
+                    moves.append(('WH', i, j))
+                if mask >> wall_index((i, j), False, self.size) & 1:
+                    moves.append(('WV', i, j))
         return moves
 
     def get_actions(self, player):
@@ -404,6 +723,36 @@ class Board:
         except Exception:
             raise InvalidAction(action, player)
 
+    def do_action(self, action, player):
+        """Play a valid action (see is_action_valid) in a way that undo
+        can revert. The actions must be undone in the reverse order they
+        were done.
+        Return the token to give to undo.
+        """
+        token = (action, player, self.pawns[player], self.distance_maps)
+        kind, x, y = action
+        if kind == 'P':
+            self.move_pawn((x, y), player)
+        else:
+            is_horiz = kind == 'WH'
+            (self.horiz_walls if is_horiz else self.verti_walls).append((x, y))
+            set_wall_edges(self.open_dirs, (x, y), is_horiz, False)
+            self.distance_maps = [None, None]
+            self.nb_walls[player] -= 1
+        return token
+
+    def undo(self, token):
+        """Revert the action of a token returned by do_action."""
+        (action, player, pawn, self.distance_maps) = token
+        kind, x, y = action
+        if kind == 'P':
+            self.pawns[player] = pawn
+        else:
+            is_horiz = kind == 'WH'
+            (self.horiz_walls if is_horiz else self.verti_walls).pop()
+            set_wall_edges(self.open_dirs, (x, y), is_horiz, True)
+            self.nb_walls[player] += 1
+
     def is_finished(self):
         """Return whether no more moves can be made (i.e.,
         game finished).
@@ -450,6 +799,9 @@ def dict_to_board(dictio):
         clone_board.verti_walls.append((x, y))
     clone_board.nb_walls[0] = dictio['nb_walls'][0]
     clone_board.nb_walls[1] = dictio['nb_walls'][1]
+    clone_board.open_dirs = open_dirs_grid(clone_board.size,
+                                           clone_board.horiz_walls,
+                                           clone_board.verti_walls)
     return clone_board
 
 
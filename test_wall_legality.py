@@ -0,0 +1,106 @@
+"""
+Wall legality of CustomBoard and BitBoard compared with the referee
+quoridor.Board on random positions. Run with: python -m pytest -q
+"""
+
+import random
+import unittest
+
+from BitBoard import BitBoard
+from CustomBoard import CustomBoard
+from quoridor import Board, NoPath, dict_to_board
+
+NB_POSITIONS = 100
+NB_NO_PATH_POSITIONS = 30
+
+# Position where the opponent pawn closes the only corridor of player 0:
+# the referee rejects every wall
+BLOCKED_PERCEPTS = {
+    'pawns': [(4, 5), (5, 4)], 'goals': [8, 0],
+    'horiz_walls': [(7, 7), (4, 3), (2, 4), (0, 4), (5, 2), (6, 0), (6, 7),
+                    (6, 5), (0, 2)],
+    'verti_walls': [(4, 2), (6, 1), (2, 3), (6, 4), (6, 2), (3, 6), (6, 6)],
+    'nb_walls': [4, 0]}
+
+
+def random_walls(rng, min_walls):
+    """Returns the horizontal and vertical walls of a random game where
+    only walls are played"""
+    board = Board()
+    for _ in range(rng.randint(min_walls, 20)):
+        walls = board.get_legal_wall_moves(0) + board.get_legal_wall_moves(1)
+        if not walls:
+            break
+        kind, x, y = rng.choice(walls)
+        board.add_wall((x, y), kind == 'WH', rng.randrange(2))
+    return list(board.horiz_walls), list(board.verti_walls)
+
+
+def random_percepts(rng, blocked):
+    """Returns the percepts of random walls with the pawns put on random
+    cells. If blocked, the pawns are next to each other and one of the
+    players has no path"""
+    while True:
+        horiz_walls, verti_walls = random_walls(rng, 10 if blocked else 0)
+        percepts = {'goals': [8, 0], 'horiz_walls': horiz_walls,
+                    'verti_walls': verti_walls, 'nb_walls': [10, 10]}
+        cells = [(x, y) for x in range(1, 8) for y in range(9)]
+        if not blocked:
+            percepts['pawns'] = rng.sample(cells, 2)
+            return percepts
+        candidates = []
+        for (x, y) in cells:
+            for opponent in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if opponent in cells:
+                    percepts['pawns'] = [(x, y), opponent]
+                    if has_no_path(dict_to_board(percepts)):
+                        candidates.append(percepts['pawns'])
+        if candidates:
+            percepts['pawns'] = rng.choice(candidates)
+            return percepts
+
+
+def has_no_path(board):
+    try:
+        board.min_steps_before_victory(0)
+        board.min_steps_before_victory(1)
+        return False
+    except NoPath:
+        return True
+
+
+class WallLegalityTest(unittest.TestCase):
+
+    def assert_same_walls(self, percepts):
+        referee = dict_to_board(percepts)
+        expected = [(kind, x, y) for kind in ('WH', 'WV')
+                    for x in range(8) for y in range(8)
+                    if referee.is_action_valid((kind, x, y), 0)]
+        for engine in (CustomBoard, BitBoard):
+            board = engine(percepts)
+            walls = [(kind, x, y) for kind in ('WH', 'WV')
+                     for x in range(8) for y in range(8)
+                     if board.is_wall_possible_here((x, y), kind == 'WH')]
+            self.assertEqual(walls, expected, (engine.__name__, percepts))
+            self.assertEqual(sorted(board.get_legal_wall_moves(0)), expected,
+                             (engine.__name__, percepts))
+
+    def test_blocked_corridor(self):
+        self.assertTrue(has_no_path(dict_to_board(BLOCKED_PERCEPTS)))
+        self.assert_same_walls(BLOCKED_PERCEPTS)
+
+    def test_random_positions(self):
+        rng = random.Random(8215)
+        for _ in range(NB_POSITIONS):
+            self.assert_same_walls(random_percepts(rng, False))
+
+    def test_random_no_path_positions(self):
+        rng = random.Random(1975)
+        for _ in range(NB_NO_PATH_POSITIONS):
+            percepts = random_percepts(rng, True)
+            self.assertTrue(has_no_path(dict_to_board(percepts)))
+            self.assert_same_walls(percepts)
+
+
+if __name__ == '__main__':
+    unittest.main()